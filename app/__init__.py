@@ -1,31 +1,62 @@
 from flask import Flask
 from config import Config
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_moment import Moment
 from flask_mail import Mail
+from app.last_seen import LastSeen
+from app.caching import Cache
+from app.passwords import Passwords
+from app.email import MailQueue
+from app.pool import engine_options
+from app.instrumentation import Instrumentation
+from app.compression import Compress
+from app.json_provider import json_provider
 from logging.handlers import RotatingFileHandler
 import os
 import logging
 
-app = Flask(__name__)
-app.config.from_object(Config)
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-login = LoginManager(app)
+db = SQLAlchemy()
+login = LoginManager()
 login.login_view = 'auth.login'
-mail = Mail(app)
-moment = Moment(app)
+mail = Mail()
+moment = Moment()
+last_seen = LastSeen()
+cache = Cache()
+passwords = Passwords()
+mail_queue = MailQueue()
+instrumentation = Instrumentation()
+compress = Compress()
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    app.json = json_provider(app)
+
+    # Must be set before anything touches app.jinja_env
+    if app.config['TEMPLATE_CACHE_DIR']:
+        from jinja2 import FileSystemBytecodeCache
+        os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+        app.jinja_options = {**app.jinja_options,
+                             'bytecode_cache': FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])}
+
     db.init_app(app)
-    migrate.init_app(app, db)
+    # Alembic is only needed by the flask db commands, so web workers never import it
+    if os.environ.get('FLASK_RUN_FROM_CLI'):
+        from flask_migrate import Migrate
+        Migrate(app, db)
     login.init_app(app)
     mail.init_app(app)
     moment.init_app(app)
+    last_seen.init_app(app)
+    cache.init_app(app)
+    passwords.init_app(app)
+    mail_queue.init_app(app)
+    instrumentation.init_app(app)
+    # Registered last so it runs first among the after_request hooks and the
+    # request metrics include compression time
+    compress.init_app(app)
 
     from app.errors import bp as errors_bp
     app.register_blueprint(errors_bp)
@@ -36,6 +67,12 @@ def create_app(config_class=Config):
     from app.main import bp as main_bp
     app.register_blueprint(main_bp)
 
+    from app.metrics import bp as metrics_bp
+    app.register_blueprint(metrics_bp)
+
+    from app.cli import bp as cli_bp
+    app.register_blueprint(cli_bp)
+
     if not app.debug:
         if not os.path.exists('logs'):
             os.mkdir('logs')
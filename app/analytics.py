@@ -0,0 +1,123 @@
+import numpy as np
+import sqlalchemy as sa
+from flask import current_app
+from app import db
+from app.caching import LRUCache
+from app.models import Exercise
+
+
+def load_history(workout_id):
+    # One query into columnar arrays; missing values become NaN so every pass below stays vectorized.
+    # Selecting date() on a Core connection leaves day parsing to NumPy and skips ORM row processing.
+    exercise = Exercise.__table__
+    rows = db.session.connection().execute(
+        sa.select(sa.func.date(exercise.c.date), exercise.c.weight, exercise.c.count, exercise.c.distance)
+        .where(exercise.c.workout_id == workout_id)
+        .order_by(exercise.c.date, exercise.c.id)
+    ).all()
+    if not rows:
+        return {'date': np.array([], dtype='datetime64[D]'),
+                'weight': np.array([]), 'count': np.array([]), 'distance': np.array([])}
+    dates, weights, counts, distances = zip(*rows)
+    return {
+        'date': np.array(dates, dtype='datetime64[D]'),
+        'weight': np.array(weights, dtype=float),
+        'count': np.array(counts, dtype=float),
+        'distance': np.array(distances, dtype=float),
+    }
+
+
+def estimated_1rm(weight, count):
+    # Epley and Brzycki estimates; a single rep is the 1RM itself and Brzycki is undefined from 37 reps
+    with np.errstate(divide='ignore', invalid='ignore'):
+        epley = np.where(count == 1, weight, weight * (1 + count / 30))
+        brzycki = np.where(count < 37, weight * 36 / (37 - count), np.nan)
+    return epley, brzycki
+
+
+def running_best(values):
+    return np.fmax.accumulate(values) if values.size else values
+
+
+def to_list(values):
+    return [None if np.isnan(v) else round(float(v), 1) for v in values]
+
+
+def best(values):
+    return None if not values.size or np.all(np.isnan(values)) else round(float(np.nanmax(values)), 1)
+
+
+def compute_progress(history):
+    date, weight, count, distance = history['date'], history['weight'], history['count'], history['distance']
+    epley, brzycki = estimated_1rm(weight, count)
+    volume = np.nan_to_num(weight * count)
+    distance_done = np.nan_to_num(distance)
+
+    # Sets at which the running best estimated 1RM improved
+    best_epley = np.nan_to_num(running_best(epley), nan=-np.inf)
+    improved = best_epley > np.concatenate(([-np.inf], best_epley[:-1]))
+    pr_history = [{'date': str(d), 'weight': w, 'count': c, 'e1rm': e} for d, w, c, e in zip(
+        date[improved].astype(str), to_list(weight[improved]), to_list(count[improved]), to_list(epley[improved]))]
+
+    # Per-session (per-day) totals
+    days, session = np.unique(date, return_inverse=True)
+    session_sets = np.bincount(session, minlength=days.size)
+    session_volume = np.bincount(session, weights=volume, minlength=days.size)
+    session_distance = np.bincount(session, weights=distance_done, minlength=days.size)
+    session_best = np.full(days.size, -np.inf)
+    np.fmax.at(session_best, session, np.nan_to_num(epley, nan=-np.inf))
+    session_best[np.isinf(session_best)] = np.nan
+
+    # Weekly totals on Monday-aligned weeks with a rolling 4-week sum
+    weekly = []
+    trend = {'volume_4w': 0, 'previous_volume_4w': 0, 'distance_4w': 0, 'previous_distance_4w': 0}
+    if days.size:
+        # 1970-01-01 was a Thursday, so shift by 3 days to start weeks on Monday
+        week = (days.astype('int64') + 3) // 7
+        first, last = week[0], max(week[-1], (np.datetime64('today', 'D').astype('int64') + 3) // 7)
+        slot = week[session] - first
+        week_volume = np.bincount(slot, weights=volume, minlength=last - first + 1)
+        week_distance = np.bincount(slot, weights=distance_done, minlength=last - first + 1)
+        window = np.ones(4)
+        rolling_volume = np.convolve(week_volume, window)[:week_volume.size]
+        rolling_distance = np.convolve(week_distance, window)[:week_distance.size]
+        starts = ((np.arange(first, last + 1) * 7) - 3).astype('datetime64[D]')
+        weekly = [{'week': str(s), 'volume': v, 'distance': d, 'rolling_volume': rv, 'rolling_distance': rd}
+                  for s, v, d, rv, rd in zip(starts.astype(str), to_list(week_volume), to_list(week_distance),
+                                             to_list(rolling_volume), to_list(rolling_distance))]
+        trend = {
+            'volume_4w': float(rolling_volume[-1]),
+            'previous_volume_4w': float(rolling_volume[-5]) if rolling_volume.size > 4 else 0.0,
+            'distance_4w': float(rolling_distance[-1]),
+            'previous_distance_4w': float(rolling_distance[-5]) if rolling_distance.size > 4 else 0.0,
+        }
+
+    return {
+        'sets': int(date.size),
+        'personal_records': {
+            'weight': best(weight), 'count': best(count), 'distance': best(distance),
+            'e1rm_epley': best(epley), 'e1rm_brzycki': best(brzycki),
+            'session_volume': best(session_volume), 'session_distance': best(session_distance),
+        },
+        'pr_history': pr_history,
+        'sessions': [{'date': str(d), 'sets': int(n), 'volume': v, 'distance': dist, 'best_e1rm': e}
+                     for d, n, v, dist, e in zip(days.astype(str), session_sets, to_list(session_volume),
+                                                 to_list(session_distance), to_list(session_best))],
+        'weekly': weekly,
+        'trend': trend,
+    }
+
+
+def workout_progress(workout_id, data_version):
+    # Cached per (workout, workout data version): writes to the workout's sets bump the version, so
+    # stale entries are never read and logging a set elsewhere leaves this entry warm
+    cache = current_app.extensions.get('progress_cache')
+    if cache is None:
+        cache = current_app.extensions['progress_cache'] = LRUCache(
+            max_entries=current_app.config['PROGRESS_CACHE_SIZE'], default_timeout=3600)
+    key = (workout_id, data_version)
+    progress = cache.get(key)
+    if progress is None:
+        progress = compute_progress(load_history(workout_id))
+        cache.set(key, progress)
+    return progress
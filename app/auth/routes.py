@@ -2,7 +2,7 @@ from flask_login import current_user, login_user, logout_user
 from flask import render_template, flash, redirect, url_for, request
 from urllib.parse import urlsplit
 import sqlalchemy as sa
-from app import db
+from app import db, passwords
 from app.auth import bp
 from app.auth.email import send_password_reset_email
 from app.auth.forms import LoginForm, RegistrationForm, ResetPasswordRequestForm, ResetPasswordForm
@@ -23,6 +23,11 @@ def login():
         if user is None or not user.check_password(form.password.data):
             flash('Invalid username or password')
             return redirect(url_for('auth.login'))
+
+        # Upgrade hashes made with older parameters while the plaintext is at hand
+        if passwords.needs_rehash(user.password_hash):
+            user.set_password(form.password.data)
+            db.session.commit()
         
         # Establish user session 
         login_user(user, remember=form.remember_me.data)
@@ -0,0 +1,166 @@
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from hashlib import md5
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+
+
+class LRUCache:
+    # In-process cache with per-entry TTL, bounded by entry count and approximate size in bytes
+    def __init__(self, max_entries=1024, max_bytes=64 * 2**20, default_timeout=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_timeout = default_timeout
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    @staticmethod
+    def sizeof(value):
+        return len(value) if isinstance(value, (str, bytes)) else sys.getsizeof(value)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self.remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, timeout=None):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + (timeout or self.default_timeout)
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (value, expires, size)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+
+    def remove(self, key):
+        # Caller holds the lock
+        self.size -= self.entries.pop(key)[2]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self.entries), 'bytes': self.size}
+
+
+class SharedCache:
+    # Wraps a Redis-style client (get, set with ex=, delete) so every worker sees the same entries
+    def __init__(self, client, default_timeout=300, prefix='fitness-tracker:'):
+        self.client = client
+        self.default_timeout = default_timeout
+        self.prefix = prefix
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=timeout or self.default_timeout)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def stats(self):
+        # Evictions happen server side and are reported by the server itself
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': None}
+
+
+class Cache:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_TYPE', 'lru')
+        app.config.setdefault('CACHE_DEFAULT_TIMEOUT', 300)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_MAX_BYTES', 64 * 2**20)
+        app.config.setdefault('CACHE_REDIS_URL', None)
+
+        if app.config['CACHE_TYPE'] == 'redis':
+            import redis
+            backend = SharedCache(redis.Redis.from_url(app.config['CACHE_REDIS_URL']),
+                                  app.config['CACHE_DEFAULT_TIMEOUT'])
+        elif app.config['CACHE_TYPE'] == 'lru':
+            backend = LRUCache(app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_MAX_BYTES'],
+                               app.config['CACHE_DEFAULT_TIMEOUT'])
+        else:
+            backend = None
+        app.extensions['cache'] = backend
+
+    @property
+    def backend(self):
+        return current_app.extensions['cache']
+
+    def get(self, key):
+        return self.backend.get(key) if self.backend else None
+
+    def set(self, key, value, timeout=None):
+        if self.backend:
+            self.backend.set(key, value, timeout)
+
+    def stats(self):
+        return self.backend.stats() if self.backend else {}
+
+
+def page_key():
+    # The data version changes on every write, so entries for older versions are simply never read again
+    csrf = md5(session.get('csrf_token', '').encode()).hexdigest()[:8]
+    return 'page:{}:{}:{}:{}:{}:{}:{}'.format(
+        current_user.id, current_user.data_version, request.endpoint,
+        sorted(request.view_args.items()), request.query_string.decode(),
+        time.strftime('%Y-%m-%d'), csrf)
+
+
+def cached_page(view):
+    # Caches the rendered HTML of a GET view per (user, route, args, data version)
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from app import cache
+        if request.method != 'GET' or not current_user.is_authenticated or session.get('_flashes'):
+            return view(*args, **kwargs)
+        key = page_key()
+        html = cache.get(key)
+        if html is not None:
+            response = make_response(html)
+            response.headers['X-Cache'] = 'HIT'
+            return response
+        rv = view(*args, **kwargs)
+        if not isinstance(rv, str):
+            return rv
+        cache.set(key, rv)
+        response = make_response(rv)
+        response.headers['X-Cache'] = 'MISS'
+        return response
+    return wrapper
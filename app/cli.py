@@ -0,0 +1,115 @@
+import time
+import click
+import sqlalchemy as sa
+from flask import Blueprint, current_app
+from app import db
+from app.compression import precompress
+from app.models import User, Workout, Exercise
+from app import sync, transfer
+
+bp = Blueprint('cli', __name__, cli_group=None)
+
+
+def get_user(username):
+    user = db.session.scalar(sa.select(User).where(User.username == username))
+    if user is None:
+        raise click.BadParameter(f'no user named {username}')
+    return user
+
+
+def guess_format(path, fmt):
+    return fmt or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+
+
+@bp.cli.group()
+def history():
+    """Export and import a user's training history."""
+    pass
+
+
+@history.command('export')
+@click.argument('username')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(transfer.FORMATS))
+def export_history(username, path, fmt):
+    """Stream USERNAME's history to PATH."""
+    user = get_user(username)
+    chunks = transfer.export_csv(user.id) if guess_format(path, fmt) == 'csv' else transfer.export_jsonl(user.id)
+    with open(path, 'w', newline='') as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+
+@history.command('import')
+@click.argument('username')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(transfer.FORMATS))
+@click.option('--batch-size', default=1000, show_default=True)
+def import_history(username, path, fmt, batch_size):
+    """Load PATH into USERNAME's history in batches."""
+    user = get_user(username)
+    with open(path, newline='') as f:
+        try:
+            count = transfer.import_rows(user, transfer.read_rows(f, guess_format(path, fmt)), batch_size)
+        except transfer.TransferError as e:
+            raise click.ClickException(str(e))
+    click.echo(f'Imported {count} sets')
+
+
+@bp.cli.command('compile-templates')
+def compile_templates():
+    """Compile every template into TEMPLATE_CACHE_DIR."""
+    if not current_app.config['TEMPLATE_CACHE_DIR']:
+        raise click.ClickException('TEMPLATE_CACHE_DIR is not set')
+    names = current_app.jinja_env.list_templates()
+    for name in names:
+        current_app.jinja_env.get_template(name)
+    click.echo(f"Compiled {len(names)} templates into {current_app.config['TEMPLATE_CACHE_DIR']}")
+
+
+@bp.cli.command('compress-static')
+def compress_static():
+    """Write .gz (and .br, with brotli installed) copies of the static files."""
+    written = precompress(current_app.static_folder, current_app.extensions['compress'],
+                          current_app.config['COMPRESS_MIN_SIZE'])
+    click.echo(f'Wrote {len(written)} precompressed files')
+
+
+@bp.cli.command('compact-orphans')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--pause', default=0.5, show_default=True, help='Seconds to sleep between batches.')
+@click.option('--dry-run', is_flag=True, help='Count the orphans without deleting them.')
+def compact_orphans(batch_size, pause, dry_run):
+    """Delete sets whose workout no longer exists, in small throttled batches."""
+    # Sets left behind by workout deletes from before ON DELETE CASCADE, with workout_id cleared
+    # by the ORM or pointing at a removed row
+    orphaned = sa.or_(Exercise.workout_id.is_(None),
+                      ~sa.exists().where(Workout.id == Exercise.workout_id))
+    if dry_run:
+        count = db.session.scalar(sa.select(sa.func.count()).select_from(Exercise).where(orphaned))
+        click.echo(f'{count} orphaned sets')
+        return
+
+    # Walks the table in id order so each batch starts where the last one ended, and commits
+    # every batch so locks are held briefly and concurrent writers can interleave
+    last_id, deleted = 0, 0
+    while True:
+        ids = db.session.scalars(sa.select(Exercise.id).where(Exercise.id > last_id, orphaned)
+                                 .order_by(Exercise.id).limit(batch_size)).all()
+        if not ids:
+            break
+        db.session.execute(sa.delete(Exercise).where(Exercise.id.in_(ids)))
+        db.session.commit()
+        last_id = ids[-1]
+        deleted += len(ids)
+        click.echo(f'Deleted {deleted} orphaned sets')
+        time.sleep(pause)
+    click.echo(f'Done, {deleted} orphaned sets deleted')
+
+
+@bp.cli.command('purge-tombstones')
+def purge_tombstones():
+    """Delete sync tombstones older than SYNC_TOMBSTONE_DAYS."""
+    count = sync.purge_tombstones(current_app.config['SYNC_TOMBSTONE_DAYS'])
+    db.session.commit()
+    click.echo(f'Deleted {count} tombstones')
@@ -0,0 +1,151 @@
+import gzip
+import mimetypes
+import os
+import zlib
+from flask import current_app, request, send_from_directory
+from werkzeug.exceptions import NotFound
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = {'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript', 'application/javascript',
+                'application/json', 'application/x-ndjson', 'image/svg+xml', 'image/x-icon',
+                'image/vnd.microsoft.icon'}
+
+
+class GzipEncoder:
+    name, suffix = 'gzip', '.gz'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        # mtime=0 keeps the output identical for identical bodies
+        return gzip.compress(data, self.level, mtime=0)
+
+    def stream(self, chunks):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            # A sync flush per chunk so streamed pages still reach the browser as they render
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+class BrotliEncoder:
+    name, suffix = 'br', '.br'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.level)
+
+    def stream(self, chunks):
+        compressor = brotli.Compressor(quality=self.level)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+def closing(chunks, response_iter):
+    # Closing the compressed stream must still close the view's generator
+    try:
+        yield from chunks
+    finally:
+        if hasattr(response_iter, 'close'):
+            response_iter.close()
+
+
+class Compress:
+    # Compresses responses for clients that accept it, preferring brotli when it is installed,
+    # and serves .br / .gz siblings of static files written by `flask compress-static`
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BR_LEVEL', 4)
+        encoders = [GzipEncoder(app.config['COMPRESS_LEVEL'])]
+        if brotli is not None:
+            encoders.insert(0, BrotliEncoder(app.config['COMPRESS_BR_LEVEL']))
+        app.extensions['compress'] = encoders
+        app.after_request(self.compress_response)
+        if app.has_static_folder:
+            app.view_functions['static'] = lambda filename: self.send_static(app, filename)
+
+    def accepted(self, app):
+        return [encoder for encoder in app.extensions['compress'] if request.accept_encodings[encoder.name]]
+
+    def send_static(self, app, filename):
+        mimetype = mimetypes.guess_type(filename)[0]
+        if mimetype not in COMPRESSIBLE:
+            return app.send_static_file(filename)
+        for encoder in self.accepted(app):
+            try:
+                response = send_from_directory(app.static_folder, filename + encoder.suffix,
+                                               max_age=app.get_send_file_max_age(filename))
+            except NotFound:
+                continue
+            # The precompressed sibling carries the original file's type
+            response.mimetype = mimetype
+            response.headers['Content-Encoding'] = encoder.name
+            response.vary.add('Accept-Encoding')
+            return response
+        response = app.send_static_file(filename)
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def compress_response(self, response):
+        if response.mimetype not in COMPRESSIBLE or response.status_code < 200 \
+                or response.status_code in (204, 206, 304) or request.method == 'HEAD':
+            return response
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoders = self.accepted(current_app)
+        if not encoders:
+            return response
+        encoder = encoders[0]
+        if response.is_streamed:
+            response.response = closing(encoder.stream(response.iter_encoded()), response.response)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+                return response
+            response.set_data(encoder.compress(data))
+        response.headers['Content-Encoding'] = encoder.name
+        # A compressed body is a different byte sequence, so a strong validator would be wrong
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def precompress(directory, encoders, min_size):
+    # Writes .gz / .br next to each compressible static file; returns the files written
+    written = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            mimetype, encoding = mimetypes.guess_type(name)
+            # Already-compressed siblings from an earlier run report an encoding and are skipped
+            if encoding or mimetype not in COMPRESSIBLE or os.path.getsize(path) < min_size:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            for encoder in encoders:
+                target = path + encoder.suffix
+                with open(target, 'wb') as f:
+                    f.write(encoder.compress(data))
+                written.append(target)
+    return written
@@ -1,14 +1,150 @@
+import atexit
+import queue
+import smtplib
+import threading
+import time
+from collections import deque
+from flask import current_app
 from flask_mail import Message
-from threading import Thread
-from app import app, mail
 
-# Send reset email in the background to free up resources
-def send_async_email(app, msg):
-    with app.app_context():
-        mail.send(msg)
+
+class MailQueueFull(Exception):
+    pass
+
+
+class MailState:
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=size)
+        self.workers = []
+        self.stopping = threading.Event()
+        self.sent = self.failed = self.connections = 0
+
+
+class MailQueue:
+    # A fixed pool of worker threads drains a bounded queue, sending each batch
+    # over one SMTP connection instead of one thread and connection per email
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MAIL_QUEUE_SIZE', 500)
+        app.config.setdefault('MAIL_WORKERS', 2)
+        app.config.setdefault('MAIL_BATCH_SIZE', 50)
+        app.config.setdefault('MAIL_MAX_RETRIES', 3)
+        app.config.setdefault('MAIL_RETRY_BACKOFF', 1.0)
+        app.config.setdefault('MAIL_DRAIN_TIMEOUT', 10)
+        app.extensions['mail_queue'] = MailState(app.config['MAIL_QUEUE_SIZE'])
+        atexit.register(self.drain, app)
+
+    def start(self, app, state):
+        # Started on first use so each gunicorn worker gets its own threads after forking
+        with state.lock:
+            if not state.workers:
+                state.stopping.clear()
+                for i in range(app.config['MAIL_WORKERS']):
+                    worker = threading.Thread(target=self.work, args=(app, state),
+                                              name=f'mail-worker-{i}', daemon=True)
+                    worker.start()
+                    state.workers.append(worker)
+
+    def send(self, msg):
+        app = current_app._get_current_object()
+        state = app.extensions['mail_queue']
+        self.start(app, state)
+        try:
+            state.queue.put_nowait(msg)
+        except queue.Full:
+            raise MailQueueFull()
+
+    def work(self, app, state):
+        with app.app_context():
+            while True:
+                try:
+                    batch = deque([state.queue.get(timeout=0.2)])
+                except queue.Empty:
+                    if state.stopping.is_set():
+                        return
+                    continue
+                while len(batch) < app.config['MAIL_BATCH_SIZE']:
+                    try:
+                        batch.append(state.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                count = len(batch)
+                try:
+                    self.deliver(app, state, batch)
+                except Exception:
+                    # Keep the worker alive; a malformed message must not stop the queue
+                    app.logger.exception('Dropping %d emails', len(batch))
+                    with state.lock:
+                        state.failed += len(batch)
+                finally:
+                    for _ in range(count):
+                        state.queue.task_done()
+
+    def deliver(self, app, state, batch):
+        attempts = 0
+        while batch:
+            try:
+                with app.extensions['mail'].connect() as connection:
+                    with state.lock:
+                        state.connections += 1
+                    while batch:
+                        try:
+                            connection.send(batch[0])
+                        except smtplib.SMTPRecipientsRefused as e:
+                            # Retrying will not help a refused address, so only this message is dropped
+                            app.logger.error('Mail to %s refused: %s', batch[0].recipients, e)
+                            with state.lock:
+                                state.failed += 1
+                        except smtplib.SMTPResponseException as e:
+                            # A permanent (5xx) rejection of this message, e.g. its sender or content;
+                            # transient 4xx replies go to the reconnect and retry below
+                            if e.smtp_code < 500:
+                                raise
+                            app.logger.error('Mail to %s rejected: %s', batch[0].recipients, e)
+                            with state.lock:
+                                state.failed += 1
+                        else:
+                            with state.lock:
+                                state.sent += 1
+                        batch.popleft()
+            except (smtplib.SMTPException, OSError) as e:
+                if not batch:
+                    return
+                attempts += 1
+                if attempts > app.config['MAIL_MAX_RETRIES']:
+                    app.logger.error('Dropping %d emails after %d attempts: %s', len(batch), attempts, e)
+                    with state.lock:
+                        state.failed += len(batch)
+                    return
+                time.sleep(app.config['MAIL_RETRY_BACKOFF'] * 2 ** (attempts - 1))
+
+    def drain(self, app, timeout=None):
+        # Runs when a gunicorn worker exits so queued emails are sent before the process ends
+        state = app.extensions['mail_queue']
+        if not state.workers:
+            return
+        deadline = time.monotonic() + (timeout or app.config['MAIL_DRAIN_TIMEOUT'])
+        while state.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        state.stopping.set()
+        for worker in state.workers:
+            worker.join(max(deadline - time.monotonic(), 0))
+        state.workers = []
+
+    def stats(self, app):
+        state = app.extensions['mail_queue']
+        return {'queued': state.queue.qsize(), 'sent': state.sent, 'failed': state.failed,
+                'connections': state.connections, 'workers': len(state.workers)}
+
 
 def send_email(subject, sender, recipients, text_body, html_body):
+    from app import mail_queue
+
     msg = Message(subject, sender=sender, recipients=recipients)
     msg.body = text_body
     msg.html = html_body
-    Thread(target=send_async_email, args=(app, msg)).start()
\ No newline at end of file
+    mail_queue.send(msg)
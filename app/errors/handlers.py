@@ -1,6 +1,8 @@
 from flask import render_template
 from app import db
 from app.errors import bp
+from app.passwords import HashingPoolBusy
+from app.email import MailQueueFull
 
 @bp.app_errorhandler(404)
 def not_found_error(error):
@@ -10,3 +12,12 @@ def not_found_error(error):
 def internal_error(error):
     db.session.rollback()
     return render_template('errors/500.html'), 500
+
+@bp.app_errorhandler(HashingPoolBusy)
+def hashing_busy_error(error):
+    return render_template('errors/503.html'), 503, {'Retry-After': '5'}
+
+
+@bp.app_errorhandler(MailQueueFull)
+def mail_queue_full_error(error):
+    return render_template('errors/503.html'), 503, {'Retry-After': '30'}
@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+from markupsafe import Markup
+import sqlalchemy as sa
+from app import db, cache
+from app.models import DailyActivity
+
+CELL = 11
+GAP = 2
+LEFT = 28
+TOP = 16
+# Same scale as the old calendar chart's colour axis, in five steps
+COLORS = ['#EFF3EA', '#C5E1B5', '#93C47D', '#66A84A', '#399918']
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def year_counts(user_id, year):
+    # One range read of the daily rollup's primary key
+    rows = db.session.execute(
+        sa.select(DailyActivity.day, DailyActivity.set_count)
+        .where(DailyActivity.user_id == user_id, DailyActivity.set_count > 0,
+               DailyActivity.day >= date(year, 1, 1), DailyActivity.day <= date(year, 12, 31))
+    )
+    return dict(rows.all())
+
+
+def render_svg(year, counts):
+    # Weeks are columns starting on Monday, like the ISO weeks of the dashboard. The viewBox lets
+    # the browser scale the calendar to the page, so nothing is redrawn on resize
+    first = date(year, 1, 1)
+    start = first - timedelta(days=first.weekday())
+    last = date(year, 12, 31)
+    weeks = (last - start).days // 7 + 1
+    width, height = LEFT + weeks * (CELL + GAP), TOP + 7 * (CELL + GAP)
+    busiest = max(counts.values(), default=0)
+
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="100%" '
+             f'role="img" aria-label="Training activity in {year}" font-family="Arial" font-size="9" '
+             f'fill="#1A1A19">']
+    for month in range(1, 13):
+        column = (date(year, month, 1) - start).days // 7
+        parts.append(f'<text x="{LEFT + column * (CELL + GAP)}" y="{TOP - 5}">{MONTHS[month - 1]}</text>')
+    for row, label in ((0, 'Mon'), (2, 'Wed'), (4, 'Fri')):
+        parts.append(f'<text x="0" y="{TOP + row * (CELL + GAP) + CELL - 2}">{label}</text>')
+
+    day = first
+    while day <= last:
+        offset = (day - start).days
+        x, y = LEFT + offset // 7 * (CELL + GAP), TOP + offset % 7 * (CELL + GAP)
+        count = counts.get(day, 0)
+        level = -(-4 * count // busiest) if count else 0
+        rect = f'<rect x="{x}" y="{y}" width="{CELL}" height="{CELL}" rx="2" fill="{COLORS[level]}"'
+        if count:
+            rect += f'><title>{day.isoformat()}: {count} sets</title></rect>'
+        else:
+            rect += '/>'
+        parts.append(rect)
+        day += timedelta(days=1)
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def activity_heatmap(user_id, data_version, year):
+    # Cached per (user, data version, year): any write bumps the version, so stale entries are never read,
+    # and through a shared cache backend every worker reuses the same rendering
+    key = f'heatmap:{user_id}:{data_version}:{year}'
+    svg = cache.get(key)
+    if svg is None:
+        svg = render_svg(year, year_counts(user_id, year))
+        cache.set(key, svg, timeout=86400)
+    return Markup(svg)
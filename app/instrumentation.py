@@ -0,0 +1,152 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import sqlalchemy as sa
+from flask import g, has_request_context, request, current_app, before_render_template, template_rendered
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    # Per-endpoint counters for this process; snapshots are written to METRICS_DIR
+    # so any worker can serve totals for all of them
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.last_write = time.monotonic()
+
+    def record(self, endpoint, duration, status, queries, db_time):
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = {
+                    'count': 0, 'errors': 0, 'queries': 0, 'db_seconds': 0.0,
+                    'duration_sum': 0.0, 'buckets': [0] * len(BUCKETS)}
+            stats['count'] += 1
+            stats['errors'] += status >= 500
+            stats['queries'] += queries
+            stats['db_seconds'] += db_time
+            stats['duration_sum'] += duration
+            for i, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    stats['buckets'][i] += 1
+                    break
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.endpoints))
+
+    def write(self, directory):
+        path = os.path.join(directory, f'worker-{os.getpid()}.json')
+        # Written aside and renamed so readers never see a partial file
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+        self.last_write = time.monotonic()
+
+    def write_on_exit(self, directory):
+        # Final snapshot when a gunicorn worker exits; the directory may already be gone
+        try:
+            self.write(directory)
+        except OSError:
+            pass
+
+
+def merge(totals, endpoints):
+    for endpoint, stats in endpoints.items():
+        if endpoint not in totals:
+            totals[endpoint] = json.loads(json.dumps(stats))
+            continue
+        total = totals[endpoint]
+        for key in ('count', 'errors', 'queries', 'db_seconds', 'duration_sum'):
+            total[key] += stats[key]
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], stats['buckets'])]
+    return totals
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context() or not conn.info.get('query_start'):
+        return
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    g.db_time = g.get('db_time', 0.0) + elapsed
+    g.db_queries = g.get('db_queries', 0) + 1
+    if elapsed * 1000 >= current_app.config['SLOW_QUERY_MS']:
+        current_app.logger.warning('Slow query (%.1f ms) in %s: %s',
+                                   elapsed * 1000, request.endpoint, ' '.join(statement.split())[:500])
+
+
+def before_render(app, template, context, **extra):
+    if has_request_context():
+        g.setdefault('render_starts', []).append(time.perf_counter())
+
+
+def after_render(app, template, context, **extra):
+    if has_request_context() and g.get('render_starts'):
+        g.render_time = g.get('render_time', 0.0) + time.perf_counter() - g.render_starts.pop()
+
+
+class Instrumentation:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SLOW_QUERY_MS', 200)
+        app.config.setdefault('METRICS_DIR', None)
+        app.config.setdefault('METRICS_WRITE_INTERVAL', 10)
+        app.extensions['request_metrics'] = RequestMetrics()
+        # Engine-level listeners are global, so they are only added once
+        if not sa.event.contains(sa.engine.Engine, 'before_cursor_execute', before_cursor_execute):
+            sa.event.listen(sa.engine.Engine, 'before_cursor_execute', before_cursor_execute)
+            sa.event.listen(sa.engine.Engine, 'after_cursor_execute', after_cursor_execute)
+        before_render_template.connect(before_render, app)
+        template_rendered.connect(after_render, app)
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        if app.config['METRICS_DIR']:
+            atexit.register(app.extensions['request_metrics'].write_on_exit, app.config['METRICS_DIR'])
+
+    def start_request(self):
+        g.request_start = time.perf_counter()
+        g.db_time = g.render_time = 0.0
+        g.db_queries = 0
+
+    def finish_request(self, response):
+        if 'request_start' not in g:
+            return response
+        total = time.perf_counter() - g.request_start
+        db_time, queries = g.db_time, g.db_queries
+        response.headers['Server-Timing'] = (
+            f'db;dur={db_time * 1000:.1f};desc="{queries} queries", '
+            f'render;dur={g.render_time * 1000:.1f}, total;dur={total * 1000:.1f}')
+        metrics = current_app.extensions['request_metrics']
+        metrics.record(request.endpoint or 'unmatched', total, response.status_code, queries, db_time)
+        directory = current_app.config['METRICS_DIR']
+        if directory and time.monotonic() - metrics.last_write >= current_app.config['METRICS_WRITE_INTERVAL']:
+            metrics.write(directory)
+        return response
+
+    def endpoints(self, app):
+        # Totals across workers when METRICS_DIR is shared, otherwise this process only
+        metrics = app.extensions['request_metrics']
+        directory = app.config['METRICS_DIR']
+        if not directory:
+            return metrics.snapshot()
+        metrics.write(directory)
+        totals = {}
+        for path in glob.glob(os.path.join(directory, 'worker-*.json')):
+            try:
+                with open(path) as f:
+                    merge(totals, json.load(f))
+            except (OSError, ValueError):
+                continue
+        return totals
@@ -0,0 +1,57 @@
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONProvider(DefaultJSONProvider):
+    # Stdlib fallback. Dates go out as ISO 8601, the way orjson writes them, instead of Flask's
+    # HTTP dates, so responses are the same whichever provider is active
+    @staticmethod
+    def default(o):
+        if isinstance(o, date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+
+class OrjsonProvider(JSONProvider):
+    def options(self, compact=True):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if not compact:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        # Callers asking for stdlib-only arguments (indent, separators, ...) get the stdlib encoder
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.options()).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        compact = self.compact if self.compact is not None else not self._app.debug
+        # Handing bytes to the response skips the str round trip jsonify does; the trailing
+        # newline matches Flask's own responses
+        option = self.options(compact) | orjson.OPT_APPEND_NEWLINE
+        return self._app.response_class(orjson.dumps(obj, default=self.default, option=option),
+                                        mimetype=self.mimetype)
+
+
+PROVIDERS = {'orjson': OrjsonProvider, 'stdlib': JSONProvider}
+
+
+def json_provider(app):
+    name = app.config.get('JSON_PROVIDER') or ('orjson' if orjson is not None else 'stdlib')
+    if name not in PROVIDERS:
+        raise ValueError(f'JSON_PROVIDER must be one of {", ".join(PROVIDERS)}')
+    if name == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_PROVIDER is orjson but orjson is not installed')
+    return PROVIDERS[name](app)
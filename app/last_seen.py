@@ -0,0 +1,68 @@
+import atexit
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+
+
+class LastSeenState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.last_flush = time.monotonic()
+
+
+class LastSeen:
+    # Buffers last_seen timestamps in memory and writes them with one bulk UPDATE
+    # instead of committing on every authenticated request
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LAST_SEEN_RESOLUTION', 60)
+        app.config.setdefault('LAST_SEEN_FLUSH_INTERVAL', 30)
+        app.config.setdefault('LAST_SEEN_FLUSH_COUNT', 100)
+        app.extensions['last_seen'] = LastSeenState()
+        atexit.register(self.flush_on_exit, app)
+
+    def touch(self, app, user):
+        state = app.extensions['last_seen']
+        now = datetime.now(timezone.utc)
+        with state.lock:
+            # Skip users already seen within the configured resolution
+            seen = state.pending.get(user.id) or user.last_seen
+            if seen is not None:
+                if seen.tzinfo is None:
+                    seen = seen.replace(tzinfo=timezone.utc)
+                if now - seen < timedelta(seconds=app.config['LAST_SEEN_RESOLUTION']):
+                    return
+            state.pending[user.id] = now
+            due = (len(state.pending) >= app.config['LAST_SEEN_FLUSH_COUNT'] or
+                   time.monotonic() - state.last_flush >= app.config['LAST_SEEN_FLUSH_INTERVAL'])
+        if due:
+            self.flush(app)
+
+    def flush(self, app):
+        from app import db
+        from app.models import User, invalidate_user
+
+        state = app.extensions['last_seen']
+        with state.lock:
+            pending, state.pending = state.pending, {}
+            state.last_flush = time.monotonic()
+        if not pending:
+            return 0
+        db.session.execute(sa.update(User), [{'id': user_id, 'last_seen': seen}
+                                             for user_id, seen in pending.items()])
+        db.session.commit()
+        # Bulk UPDATEs skip mapper events, so cached user rows are dropped here
+        for user_id in pending:
+            invalidate_user(user_id)
+        return len(pending)
+
+    def flush_on_exit(self, app):
+        # Runs when a gunicorn worker exits so buffered timestamps are not lost
+        if app.extensions['last_seen'].pending:
+            with app.app_context():
+                self.flush(app)
@@ -1,3 +1,4 @@
+from flask import request
 from flask_wtf import FlaskForm
 from wtforms import StringField, SubmitField, TextAreaField, DateTimeField, SelectField, IntegerField
 from wtforms.validators import DataRequired, ValidationError, length, Optional
@@ -25,12 +26,28 @@ class EditProfileForm(FlaskForm):
             if user is not None:
                 raise ValidationError('Please use a different username')
 
+class EmptyForm(FlaskForm):
+    submit = SubmitField('Submit')
+
 class WorkoutForm(FlaskForm):
     name = StringField('Name', validators=[DataRequired()])
     exercise_type = SelectField('Exercise Type', choices=[('machine', 'Machine'), ('free_weight', 'Freeweight'), ('bodyweight', 'Bodyweight'), ('cardio', 'Cardio')], validators=[DataRequired()])
     muscle_group = SelectField('Muscle Group', choices=[('abs', 'Abs'), ('back', 'Back'), ('biceps', 'Biceps'), ('calves', 'Calves'), ('chest', 'Chest'), ('chest_lower', 'Chest (Lower)'), ('chest_upper', 'Chest (Upper)'), ('forearms', 'Forearms'), ('glutes', 'Glutes'), ('hamstrings', 'Hamstrings'),  ('heart', 'Heart'), ('hip_flexors', 'Hip Flexors'), ('inner_thighs', 'Inner thighs'), ('lats', 'Lats'), ('lower_back', 'Lower Back'), ('quadriceps', 'Quadriceps'), ('shoulders', 'Shoulders'), ('triceps', 'Triceps'),], validators=[DataRequired()])
     submit = SubmitField('Submit')
 
+class WorkoutFilterForm(FlaskForm):
+    # Read from the query string, so bookmarked and shared filter URLs work without a CSRF token
+    q = StringField('Search', validators=[Optional(), length(max=64)])
+    muscle_group = SelectField('Muscle Group', choices=[('', 'All muscle groups')] + WorkoutForm.muscle_group.kwargs['choices'], validators=[Optional()])
+    exercise_type = SelectField('Exercise Type', choices=[('', 'All types')] + WorkoutForm.exercise_type.kwargs['choices'], validators=[Optional()])
+    stale = SelectField('Status', choices=[('', 'Any status'), ('stale', 'Stale'), ('fresh', 'Done recently')], validators=[Optional()])
+    submit = SubmitField('Filter')
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('formdata', request.args)
+        kwargs.setdefault('meta', {'csrf': False})
+        super().__init__(*args, **kwargs)
+
 class ExerciseForm(FlaskForm):
     date = DateTimeField('Date', format='%Y-%m-%d', default=datetime.now(), validators=[DataRequired()])
     weight = IntegerField('Weight (lbs)', validators=[Optional()])
@@ -1,43 +1,226 @@
-from flask_login import current_user, login_required
-from flask import render_template, flash, redirect, url_for, request, jsonify, current_app
-from collections import defaultdict
+from flask_login import current_user, login_required, logout_user
+from flask import render_template, stream_template, flash, redirect, url_for, request, jsonify, current_app, \
+    stream_with_context
+from itertools import groupby
+import io
+from hashlib import md5
 import sqlalchemy as sa
-from app import db
+from app import db, last_seen, sync, transfer
+from app.caching import cached_page
+from app.heatmap import activity_heatmap
+from app.pagination import keyset_page, decode_cursor
 from app.main import bp
-from app.main.forms import EditProfileForm, WorkoutForm, ExerciseForm
-from app.models import Workout, Exercise
-from datetime import datetime, timedelta, timezone
+from app.main.forms import EditProfileForm, EmptyForm, WorkoutForm, WorkoutFilterForm, ExerciseForm
+from app.models import Workout, Exercise, DailyActivity, WeeklyActivity, Tombstone, week_of, invalidate_user
+from datetime import date, datetime, timedelta, timezone
 
 
 @bp.before_request
 def before_request():
     if current_user.is_authenticated:
-        # Social media app feature carried over from Flask tutorial
-        current_user.last_seen = datetime.now(timezone.utc)
-        db.session.commit()
+        # Social media app feature carried over from Flask tutorial; written behind in batches
+        last_seen.touch(current_app, current_user)
+
+def with_cache_headers(response, etag):
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def parse_day(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return False
 
 @bp.route('/api/workouts', methods=['GET'])
 @login_required
 def get_workout_data():
-    # Get all user's exercises by date
-    unique_dates = (
-        db.session.query(sa.func.date(Exercise.date))
-        .join(Exercise.workouts)
-        .filter(Workout.user_id == current_user.id)
-        .distinct()
-        .all()
+    # The ETag only depends on the user's data version, so revalidation never touches the exercise tables
+    etag = '{}-{}-{}'.format(current_user.id, current_user.data_version,
+                             md5(request.query_string).hexdigest()[:8])
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        return with_cache_headers(response, etag)
+
+    # Read from the daily rollup instead of scanning every exercise the user has logged
+    start = parse_day(request.args.get('from'))
+    end = parse_day(request.args.get('to'))
+    if start is False or end is False:
+        return jsonify(error='from and to must be YYYY-MM-DD dates'), 400
+
+    metric = request.args.get('metric', 'set_count')
+    if metric not in ('set_count', 'volume', 'distance'):
+        return jsonify(error='metric must be one of set_count, volume, distance'), 400
+
+    query = (
+        sa.select(DailyActivity.day, getattr(DailyActivity, metric))
+        .where(DailyActivity.user_id == current_user.id, DailyActivity.set_count > 0)
+        .order_by(DailyActivity.day)
     )
-    
-    # Format data as [date, value] pairs to properly feed data to the Google Charts activity calendar
-    date_value_pairs = [[d, 1] for (d,) in unique_dates if d is not None]
-    
-    return jsonify(date_value_pairs)
+    if start:
+        query = query.where(DailyActivity.day >= start)
+    if end:
+        query = query.where(DailyActivity.day <= end)
+
+    # [date, intensity] pairs; the JSON provider writes the dates as ISO 8601
+    date_value_pairs = [[day, value] for day, value in db.session.execute(query)]
+
+    return with_cache_headers(jsonify(date_value_pairs), etag)
+
+DASHBOARD_GROUPINGS = {'muscle_group': ['muscle_group'], 'exercise_type': ['exercise_type'],
+                       'both': ['muscle_group', 'exercise_type']}
+
+@bp.route('/api/dashboard', methods=['GET'])
+@login_required
+def get_dashboard():
+    # Weekly set counts, volume and distance for the last `weeks` weeks from the weekly rollup,
+    # so the cost depends on the number of weeks shown, not on the length of the history
+    this_week = week_of(date.today())
+    etag = '{}-{}-{}-{}'.format(current_user.id, current_user.data_version, this_week.isoformat(),
+                                md5(request.query_string).hexdigest()[:8])
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        return with_cache_headers(response, etag)
+
+    weeks = request.args.get('weeks', current_app.config['DASHBOARD_WEEKS'], type=int)
+    if weeks is None or not 1 <= weeks <= current_app.config['MAX_DASHBOARD_WEEKS']:
+        return jsonify(error='weeks must be between 1 and {}'.format(current_app.config['MAX_DASHBOARD_WEEKS'])), 400
+    by = request.args.get('by', 'both')
+    if by not in DASHBOARD_GROUPINGS:
+        return jsonify(error='by must be one of muscle_group, exercise_type, both'), 400
+
+    keys = DASHBOARD_GROUPINGS[by]
+    columns = [getattr(WeeklyActivity, key) for key in keys]
+    set_count = sa.func.sum(WeeklyActivity.set_count)
+    query = (
+        sa.select(WeeklyActivity.week, *columns, set_count,
+                  sa.func.sum(WeeklyActivity.volume), sa.func.sum(WeeklyActivity.distance))
+        .where(WeeklyActivity.user_id == current_user.id,
+               WeeklyActivity.week >= this_week - timedelta(weeks=weeks - 1))
+        .group_by(WeeklyActivity.week, *columns)
+        .having(set_count > 0)
+        .order_by(WeeklyActivity.week, *columns)
+    )
+    summary = []
+    for week, rows in groupby(db.session.execute(query), key=lambda row: row[0]):
+        groups = [dict(zip(keys, row[1:-3]), set_count=row[-3], volume=row[-2], distance=row[-1]) for row in rows]
+        summary.append({'week': week.isoformat(), 'groups': groups,
+                        'set_count': sum(g['set_count'] for g in groups),
+                        'volume': sum(g['volume'] for g in groups),
+                        'distance': sum(g['distance'] for g in groups)})
+
+    return with_cache_headers(jsonify(weeks=summary), etag)
+
+def parse_set(item):
+    # Mirrors ExerciseForm: a required date plus optional integer weight, count and distance
+    if not isinstance(item, dict):
+        return None, 'must be an object'
+    try:
+        exercise_date = datetime.fromisoformat(item['date'])
+    except (KeyError, TypeError, ValueError):
+        return None, 'date must be an ISO 8601 date'
+    if exercise_date.tzinfo is not None:
+        # Stored dates are naive UTC; an offset left on would break comparisons with them
+        exercise_date = exercise_date.astimezone(timezone.utc).replace(tzinfo=None)
+    values = {'date': exercise_date}
+    for field in ('weight', 'count', 'distance'):
+        value = item.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+            return None, f'{field} must be an integer'
+        values[field] = value
+    return values, None
+
+@bp.route('/api/workouts/<int:workout_id>/exercises', methods=['POST'])
+@login_required
+def log_exercises(workout_id):
+    user_workout = db.session.get(Workout, workout_id)
+    if user_workout is None or user_workout.user_id != current_user.id:
+        return jsonify(error='workout not found'), 404
+
+    payload = request.get_json(silent=True)
+    sets = payload.get('sets') if isinstance(payload, dict) else payload
+    if not isinstance(sets, list) or not sets:
+        return jsonify(error='expected a non-empty list of sets'), 400
+    if len(sets) > current_app.config['MAX_SETS_PER_REQUEST']:
+        return jsonify(error='at most {} sets per request'.format(current_app.config['MAX_SETS_PER_REQUEST'])), 400
+
+    # Validate everything before writing anything
+    rows, errors = [], {}
+    for index, item in enumerate(sets):
+        values, error = parse_set(item)
+        if error:
+            errors[index] = error
+        else:
+            rows.append(values)
+    if errors:
+        return jsonify(error='invalid sets', details=errors), 400
+
+    # One executemany for all the sets, committed together with the rollup
+    params = [dict(row, workout_id=workout_id, user_id=current_user.id) for row in rows]
+    if db.engine.dialect.name == 'sqlite':
+        # SQLite has no sentinel for ordered RETURNING, so SQLAlchemy would send one INSERT per set.
+        # It serializes writers, so the newest ids of this workout are the ones just inserted
+        db.session.execute(sa.insert(Exercise), params)
+        ids = db.session.scalars(
+            sa.select(Exercise.id).where(Exercise.workout_id == workout_id)
+            .order_by(Exercise.id.desc()).limit(len(params))).all()[::-1]
+    else:
+        ids = db.session.scalars(
+            sa.insert(Exercise).returning(Exercise.id, sort_by_parameter_order=True), params).all()
+    set_values = [(row['date'], row['weight'], row['count'], row['distance']) for row in rows]
+    DailyActivity.record(current_user.id, set_values)
+    WeeklyActivity.record(current_user.id, user_workout.category, set_values)
+    newest = max(row['date'] for row in rows)
+    if user_workout.last_done is None or newest > user_workout.last_done:
+        user_workout.last_done = newest
+    user_workout.bump_data_version()
+    current_user.bump_data_version()
+    db.session.commit()
+
+    return jsonify(ids=ids), 201
+
+@bp.route('/export', methods=['GET'])
+@login_required
+def export_history():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in transfer.FORMATS:
+        return jsonify(error='format must be csv or jsonl'), 400
+    chunks = transfer.export_csv(current_user.id) if fmt == 'csv' else transfer.export_jsonl(current_user.id)
+    return current_app.response_class(stream_with_context(chunks), mimetype=transfer.MIMETYPES[fmt], headers={
+        'Content-Disposition': f'attachment; filename=fitness-history.{fmt}'})
+
+@bp.route('/import', methods=['POST'])
+@login_required
+def import_history():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in transfer.FORMATS:
+        return jsonify(error='format must be csv or jsonl'), 400
+    # Cross-site forms can only send form or text/plain bodies, so requiring the file's own type
+    # keeps another site from posting rows into a signed-in user's history
+    if request.mimetype != transfer.MIMETYPES[fmt]:
+        return jsonify(error=f'expected a {transfer.MIMETYPES[fmt]} body'), 415
+    # Read the upload line by line instead of buffering it
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    try:
+        count = transfer.import_rows(current_user, transfer.read_rows(lines, fmt),
+                                     current_app.config['IMPORT_BATCH_SIZE'])
+    except transfer.TransferError as e:
+        db.session.rollback()
+        return jsonify(error=str(e)), 400
+    return jsonify(imported=count)
 
 @bp.route('/')
 @bp.route('/index')
 @login_required
+@cached_page
 def index():
-    return render_template('index.html', title='Home')
+    this_year = date.today().year
+    year = request.args.get('year', this_year, type=int)
+    if year is None or not 1900 < year <= this_year:
+        year = this_year
+    return render_template('index.html', title='Home', year=year, this_year=this_year,
+                           heatmap=activity_heatmap(current_user.id, current_user.data_version, year))
 
 @bp.route('/user/<username>')
 @login_required
@@ -53,48 +236,49 @@ def edit_profile():
     if form.validate_on_submit():
         current_user.username = form.username.data
         current_user.about_me = form.about_me.data
+        current_user.bump_data_version()
         db.session.commit()
         flash('Your changes have been saved.')
         return redirect(url_for('main.edit_profile'))
     elif request.method == 'GET':
         form.username.data = current_user.username
         form.about_me.data = current_user.about_me
-    return render_template('edit_profile.html', title='Edit Profile', form=form)
+    return render_template('edit_profile.html', title='Edit Profile', form=form, delete_form=EmptyForm())
+
+@bp.route('/delete_account', methods=['POST'])
+@login_required
+def delete_account():
+    form = EmptyForm()
+    if form.validate_on_submit():
+        user_id = current_user.id
+        current_user.delete_account()
+        db.session.commit()
+        # Core deletes skip the ORM events, so drop the cached user here
+        invalidate_user(user_id)
+        logout_user()
+        flash('Your account has been deleted.')
+        return redirect(url_for('auth.login'))
+    return redirect(url_for('main.edit_profile'))
 
 @bp.route('/workouts', methods=['GET'])
 @login_required
+@cached_page
 def workouts():
     if not current_user.is_authenticated:
         return redirect(url_for('main.index'))
     
     today = datetime.today()
+    form = WorkoutFilterForm()
+    filters = filter_values(form) if form.validate() else {}
 
-    # If specific filtering in the Workouts page is requested, change this section
-    workouts = current_user.workouts.order_by(
-        Workout.muscle_group.asc(), 
-        Workout.name.asc()
-    ).all()
-
-    # Track the last completion date for each workout to guide future sessions
-    for workout in workouts:
-        exercise_dates = [ex.date for ex in workout.exercises if ex.date is not None]
-        if exercise_dates:
-            workout.last_done = max(exercise_dates)
-        else:
-            workout.last_done = None
-        
-        if not workout.last_done:
-            workout.is_stale = True
-        else:
-            workout.is_stale = (today - workout.last_done) > timedelta(days=14)
-
-    # Categorize workouts by muscle group so frontend can organize workouts appropriately
-    grouped_workouts = defaultdict(list)
-    for workout in workouts:
-        group = workout.muscle_group or 'other'
-        grouped_workouts[group].append(workout)
+    # One indexed query; staleness is computed by the database and rows arrive grouped by muscle group
+    query = workout_list_query(current_user.id, filters, today)
+    rows = db.session.execute(query.add_columns(Workout.stale_clause(today).label('stale'))).all()
+    grouped_workouts = {group or 'other': list(items)
+                        for group, items in groupby(rows, key=lambda row: row.Workout.muscle_group)}
 
-    return render_template('workouts.html', title='Workouts', grouped_workouts=grouped_workouts)
+    return render_template('workouts.html', title='Workouts', form=form, grouped_workouts=grouped_workouts,
+                           filtered=bool(filters and any(filters.values())))
 
 @bp.route('/create-workout', methods=['GET', 'POST'])
 @login_required
@@ -109,6 +293,7 @@ def create_workout():
             user_id=current_user.id  
         )
         db.session.add(new_workout)
+        current_user.bump_data_version()
         db.session.commit()
         flash("Workout created successfully!")
         return redirect(url_for('main.workouts'))
@@ -127,9 +312,13 @@ def edit_workout(workout_id):
     
     form = WorkoutForm()
     if form.validate_on_submit():
-        user_workout.name=form.name.data, 
-        user_workout.exercise_type=form.exercise_type.data,       
-        user_workout.muscle_group=form.muscle_group.data,
+        old_category = user_workout.category
+        user_workout.name = form.name.data
+        user_workout.exercise_type = form.exercise_type.data
+        user_workout.muscle_group = form.muscle_group.data
+        if user_workout.category != old_category:
+            WeeklyActivity.recategorise(user_workout, *old_category)
+        current_user.bump_data_version()
         db.session.commit()
         flash("Workout edited successfully!")
         return redirect(url_for('main.workouts'))
@@ -152,12 +341,161 @@ def delete_workout(workout_id):
         flash("You do not have permission to delete this workout", "ERROR")
         return redirect(url_for('main.index'))
     
-    db.session.delete(user_workout)
+    user_workout.delete()
+    current_user.bump_data_version()
     db.session.commit()
     return redirect(url_for('main.workouts'))
 
+def history_cursors():
+    # The after/before cursors of a history request; None if one is malformed
+    cursors = {}
+    for name in ('after', 'before'):
+        value = request.args.get(name)
+        if value:
+            cursors[name] = decode_cursor(value)
+            if cursors[name] is None:
+                return None
+    return cursors
+
+def exercise_history(workout_id, per_page):
+    # One keyset page of a workout's sets, newest first; None if a cursor is malformed
+    cursors = history_cursors()
+    if cursors is None:
+        return None
+    query = sa.select(Exercise).where(Exercise.workout_id == workout_id)
+    return keyset_page(query, Exercise.date, Exercise.id, per_page, **cursors)
+
+def history_rows(workout_id, batch_size=500):
+    # Every set of a workout, newest first, as plain rows from a server-side cursor so neither
+    # the identity map nor the result buffer grows with the history
+    query = (
+        sa.select(Exercise.id, Exercise.date, Exercise.weight, Exercise.count, Exercise.distance)
+        .where(Exercise.workout_id == workout_id)
+        .order_by(Exercise.date.desc(), Exercise.id.desc())
+        .execution_options(yield_per=batch_size)
+    )
+    yield from db.session.execute(query)
+
+def buffered(pieces, size=16384):
+    # Jinja yields one small string per template node; send them to the client in larger writes
+    chunk, length = [], 0
+    for piece in pieces:
+        chunk.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+def history_page_size():
+    per_page = min(request.args.get('limit', current_app.config['WORKOUTS_PER_PAGE'], type=int),
+                   current_app.config['MAX_SETS_PER_REQUEST'])
+    return max(per_page, 1)
+
+def exercise_json(exercise):
+    return {'id': exercise.id, 'date': exercise.date.isoformat(), 'weight': exercise.weight,
+            'count': exercise.count, 'distance': exercise.distance}
+
+def workout_json(workout, today):
+    return {'id': workout.id, 'name': workout.name, 'exercise_type': workout.exercise_type,
+            'muscle_group': workout.muscle_group,
+            'last_done': workout.last_done.isoformat() if workout.last_done else None,
+            'is_stale': workout.last_done is None or today - workout.last_done > Workout.STALE_AFTER}
+
+def workout_filters():
+    # The WorkoutFilterForm fields of the query string; None if one is invalid
+    form = WorkoutFilterForm()
+    return filter_values(form) if form.validate() else None
+
+def filter_values(form):
+    # Only the filter fields, so the submit button alone does not count as filtering
+    return {name: value for name, value in form.data.items() if name not in ('submit', 'csrf_token')}
+
+def workout_list_query(user_id, filters=None, today=None):
+    # Served by ix_workout_user_id_muscle_group_name plus the name search index when searching
+    filters = filters or {}
+    query = sa.select(Workout).where(Workout.user_id == user_id)
+    if filters.get('muscle_group'):
+        query = query.where(Workout.muscle_group == filters['muscle_group'])
+    if filters.get('exercise_type'):
+        query = query.where(Workout.exercise_type == filters['exercise_type'])
+    if filters.get('stale'):
+        stale = Workout.stale_clause(today or datetime.today())
+        query = query.where(stale if filters['stale'] == 'stale' else sa.not_(stale))
+    if filters.get('q'):
+        match = Workout.name_matches(filters['q'])
+        if match is not None:
+            query = query.where(match)
+    return query.order_by(Workout.muscle_group.asc(), Workout.name.asc())
+
+@bp.route('/api/sync', methods=['GET'])
+@login_required
+def get_sync():
+    # Rows created, changed or deleted since the cursor of the previous response. While `more` is
+    # true the client keeps calling with the new cursor, which also resumes an interrupted sync.
+    # A new sync repeats recent rows, so clients apply changes by id
+    synced_at, positions, complete = None, {}, True
+    if request.args.get('since'):
+        cursor = sync.decode_sync_cursor(request.args['since'])
+        if cursor is None:
+            return jsonify(error='invalid cursor'), 400
+        synced_at, positions, complete = cursor
+    batch_size = max(min(request.args.get('limit', current_app.config['SYNC_BATCH_SIZE'], type=int),
+                         current_app.config['SYNC_BATCH_SIZE']), 1)
+    try:
+        batches, cursor, more = sync.changes(current_user.id, synced_at, positions, complete, batch_size,
+                                             current_app.config['SYNC_TOMBSTONE_DAYS'],
+                                             timedelta(seconds=current_app.config['SYNC_OVERLAP_SECONDS']))
+    except sync.CursorExpired:
+        return jsonify(error='cursor expired, sync again without since'), 410
+
+    today = datetime.today()
+    return jsonify(
+        workouts=[dict(workout_json(w, today), updated_at=w.updated_at.isoformat()) for w in batches['workouts']],
+        exercises=[dict(exercise_json(e), workout_id=e.workout_id, updated_at=e.updated_at.isoformat())
+                   for e in batches['exercises']],
+        # A deleted workout takes all of its sets with it
+        deleted=[{'type': t.kind, 'id': t.object_id} for t in batches['deleted']],
+        cursor=cursor, more=more)
+
+@bp.route('/api/workouts/<int:workout_id>/progress', methods=['GET'])
+@login_required
+def get_progress(workout_id):
+    user_workout = db.session.get(Workout, workout_id)
+    if user_workout is None or user_workout.user_id != current_user.id:
+        return jsonify(error='workout not found'), 404
+    # Imported here so numpy is only loaded once progress is first requested
+    from app.analytics import workout_progress
+    return jsonify(workout_progress(workout_id, user_workout.data_version))
+
+@bp.route('/api/workouts/<int:workout_id>/exercises', methods=['GET'])
+@login_required
+def get_exercises(workout_id):
+    user_workout = db.session.get(Workout, workout_id)
+    if user_workout is None or user_workout.user_id != current_user.id:
+        return jsonify(error='workout not found'), 404
+
+    history = exercise_history(workout_id, history_page_size())
+    if history is None:
+        return jsonify(error='invalid cursor'), 400
+
+    return jsonify(exercises=[exercise_json(e) for e in history.items],
+                   next=history.next_cursor, prev=history.prev_cursor)
+
+@bp.route('/api/workouts/list', methods=['GET'])
+@login_required
+def get_workout_list():
+    filters = workout_filters()
+    if filters is None:
+        return jsonify(error='invalid filter'), 400
+    today = datetime.today()
+    workouts = db.session.scalars(workout_list_query(current_user.id, filters, today))
+    return jsonify(workouts=[workout_json(w, today) for w in workouts])
+
 @bp.route('/log-exercise/<int:workout_id>', methods=['GET', 'POST'])
 @login_required
+@cached_page
 def log_exercise(workout_id):
     user_workout = Workout.query.get_or_404(workout_id)
 
@@ -172,27 +510,48 @@ def log_exercise(workout_id):
                     date=form.date.data,
                     weight=form.weight.data,
                     count=form.count.data,
-                    distance=form.distance.data
+                    distance=form.distance.data,
+                    workout_id=workout_id,
+                    user_id=current_user.id
                     )
-        user_workout.exercises.append(exercise)
+        # Added by key: appending to user_workout.exercises would load every set of the workout
+        db.session.add(exercise)
+        DailyActivity.record(current_user.id, [exercise.set_values])
+        WeeklyActivity.record(current_user.id, user_workout.category, [exercise.set_values])
+        if user_workout.last_done is None or exercise.date > user_workout.last_done:
+            user_workout.last_done = exercise.date
+        user_workout.bump_data_version()
+        current_user.bump_data_version()
         db.session.commit()
         return redirect(url_for('main.log_exercise', workout_id=workout_id))
     
-    page = request.args.get('page', 1, type=int)
-    exercises_paginated  = (
-        Exercise.query
-        .join(Workout.exercises)
-        .filter(Workout.id == workout_id)
-        .order_by(Exercise.date.desc())
-        .paginate(page=page, per_page=current_app.config['WORKOUTS_PER_PAGE'], error_out=False)
-    )
-    next_url = url_for('main.log_exercise', workout_id=workout_id, page=exercises_paginated.next_num) \
-        if exercises_paginated.has_next else None
-    prev_url = url_for('main.log_exercise', workout_id=workout_id, page=exercises_paginated.prev_num) \
-        if exercises_paginated.has_prev else None
+    history = exercise_history(workout_id, current_app.config['WORKOUTS_PER_PAGE'])
+    if history is None:
+        return redirect(url_for('main.log_exercise', workout_id=workout_id))
+    next_url = url_for('main.log_exercise', workout_id=workout_id, after=history.next_cursor) \
+        if history.next_cursor else None
+    prev_url = url_for('main.log_exercise', workout_id=workout_id, before=history.prev_cursor) \
+        if history.prev_cursor else None
+    from app.analytics import workout_progress
     return render_template('log_exercise.html', title='Log Exercise', workout_id=workout_id, \
         workout_name=user_workout.name, exercise_type=user_workout.exercise_type, form=form, \
-        exercises=exercises_paginated.items, next_url=next_url, prev_url=prev_url)
+        exercises=history.items, next_url=next_url, prev_url=prev_url, \
+        progress=workout_progress(workout_id, user_workout.data_version))
+
+
+@bp.route('/log-exercise/<int:workout_id>/history', methods=['GET'])
+@login_required
+def exercise_history_all(workout_id):
+    user_workout = Workout.query.get_or_404(workout_id)
+    if user_workout.user_id != current_user.id:
+        flash("You do not have permission to view this workout", "ERROR")
+        return redirect(url_for('main.index'))
+
+    # Rendered while the rows are read, so the first bytes go out before the query finishes
+    pieces = stream_template('exercise_history.html', title='Exercise History', workout_id=workout_id,
+                             workout_name=user_workout.name, exercise_type=user_workout.exercise_type,
+                             exercises=history_rows(workout_id))
+    return current_app.response_class(buffered(pieces))
 
 
 @bp.route('/edit-exercise/<int:workout_id>/<int:exercise_id>', methods=['GET', 'POST'])
@@ -205,13 +564,20 @@ def edit_exercise(workout_id, exercise_id):
         flash("You do not have permission to edit this workout", "ERROR")
         return redirect(url_for('main.index'))
     
-    exercise = Exercise.query.filter_by(id=exercise_id).first_or_404()
+    exercise = Exercise.query.filter_by(id=exercise_id, workout_id=workout_id).first_or_404()
     form = ExerciseForm()
     if form.validate_on_submit():
+        DailyActivity.record(current_user.id, [exercise.set_values], sign=-1)
+        WeeklyActivity.record(current_user.id, user_workout.category, [exercise.set_values], sign=-1)
         exercise.date=form.date.data
         exercise.weight=form.weight.data
         exercise.count=form.count.data
         exercise.distance=form.distance.data
+        DailyActivity.record(current_user.id, [exercise.set_values])
+        WeeklyActivity.record(current_user.id, user_workout.category, [exercise.set_values])
+        user_workout.refresh_last_done()
+        user_workout.bump_data_version()
+        current_user.bump_data_version()
         db.session.commit()
         flash("Exercise updated successfully!")
         return redirect(url_for('main.log_exercise', workout_id=workout_id))
@@ -238,8 +604,14 @@ def delete_exercise(workout_id, exercise_id):
         flash("You do not have permission to delete this exercise", "ERROR")
         return redirect(url_for('main.index'))
     
-    exercise = Exercise.query.filter_by(id=exercise_id).first_or_404()
+    exercise = Exercise.query.filter_by(id=exercise_id, workout_id=workout_id).first_or_404()
+    DailyActivity.record(current_user.id, [exercise.set_values], sign=-1)
+    WeeklyActivity.record(current_user.id, workout.category, [exercise.set_values], sign=-1)
+    Tombstone.record(current_user.id, 'exercise', [exercise.id])
     db.session.delete(exercise)
+    workout.refresh_last_done()
+    workout.bump_data_version()
+    current_user.bump_data_version()
     db.session.commit()
     flash("Exercise deleted successfully!", "success")
 
@@ -0,0 +1,78 @@
+import hmac
+from flask import abort, current_app, request, Response
+from app import db, cache, mail_queue, instrumentation
+from app.metrics import bp
+from app.pool import pool_stats
+from app.instrumentation import BUCKETS
+
+METRICS = [
+    ('db_pool_size', 'gauge', 'Connections kept open by the pool', 'pool', 'size'),
+    ('db_pool_checked_out', 'gauge', 'Connections currently checked out', 'pool', 'checked_out'),
+    ('db_pool_checked_in', 'gauge', 'Idle connections in the pool', 'pool', 'checked_in'),
+    ('db_pool_overflow', 'gauge', 'Connections open beyond the pool size', 'pool', 'overflow'),
+    ('db_pool_checkouts_total', 'counter', 'Connection checkouts', 'pool', 'checkouts'),
+    ('db_pool_timeouts_total', 'counter', 'Checkouts that timed out waiting for a connection', 'pool', 'timeouts'),
+    ('db_pool_wait_seconds_total', 'counter', 'Time spent waiting for connections', 'pool', 'wait_seconds'),
+    ('db_pool_wait_seconds_max', 'gauge', 'Longest wait for a connection', 'pool', 'max_wait_seconds'),
+    ('cache_hits_total', 'counter', 'Page cache hits', 'cache', 'hits'),
+    ('cache_misses_total', 'counter', 'Page cache misses', 'cache', 'misses'),
+    ('cache_evictions_total', 'counter', 'Page cache evictions', 'cache', 'evictions'),
+    ('cache_entries', 'gauge', 'Entries in the page cache', 'cache', 'entries'),
+    ('mail_queued', 'gauge', 'Emails waiting to be sent', 'mail', 'queued'),
+    ('mail_sent_total', 'counter', 'Emails sent', 'mail', 'sent'),
+    ('mail_failed_total', 'counter', 'Emails dropped after failing', 'mail', 'failed'),
+]
+
+
+def collect():
+    return {'pool': pool_stats(db.engine), 'cache': cache.stats(),
+            'mail': mail_queue.stats(current_app), 'requests': instrumentation.endpoints(current_app)}
+
+
+REQUEST_METRICS = [
+    ('http_requests_total', 'counter', 'Requests handled', 'count'),
+    ('http_request_errors_total', 'counter', 'Requests answered with a 5xx status', 'errors'),
+    ('db_queries_total', 'counter', 'SQL statements executed', 'queries'),
+    ('db_query_seconds_total', 'counter', 'Time spent executing SQL', 'db_seconds'),
+]
+
+
+def render_requests(endpoints):
+    lines = ['# HELP http_request_duration_seconds Request latency',
+             '# TYPE http_request_duration_seconds histogram']
+    for endpoint, stats in sorted(endpoints.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS, stats['buckets']):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+        lines += [f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {stats["count"]}',
+                  f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {stats["duration_sum"]}',
+                  f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {stats["count"]}']
+    for name, kind, description, key in REQUEST_METRICS:
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        lines += [f'{name}{{endpoint="{endpoint}"}} {stats[key]}' for endpoint, stats in sorted(endpoints.items())]
+    return lines
+
+
+def render(stats):
+    lines = render_requests(stats['requests'])
+    for name, kind, description, group, key in METRICS:
+        if key not in stats[group]:
+            continue
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}',
+                  f'{name} {stats[group][key]}']
+    return '\n'.join(lines) + '\n'
+
+
+@bp.before_request
+def check_token():
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(404)
+
+
+@bp.route('/metrics')
+def metrics():
+    # Request metrics cover all workers when METRICS_DIR is set; pool, cache and mail
+    # figures are for the worker that serves the scrape
+    return Response(render(collect()), mimetype='text/plain; version=0.0.4')
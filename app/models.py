@@ -1,23 +1,58 @@
-from werkzeug.security import generate_password_hash, check_password_hash
+import re
 from hashlib import md5
 from time import time
-import jwt
-from datetime import datetime, timezone
+from collections import defaultdict
+from datetime import datetime, date, timedelta, timezone
 from flask import current_app
 from flask_login import UserMixin
 from typing import Optional, List
-from sqlalchemy import String, Boolean, Integer, ForeignKey, Table, Column
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from app import db, login
+import sqlalchemy as sa
+from sqlalchemy import String, Boolean, Integer, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates, make_transient_to_detached
+from sqlalchemy.orm.exc import ObjectDeletedError
+from app import db, login, passwords
+from app.caching import LRUCache
+
+def utcnow():
+    # Naive UTC, so SQLite and Postgres store and compare the same value
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def user_cache():
+    cache = current_app.extensions.get('user_cache')
+    if cache is None:
+        cache = current_app.extensions['user_cache'] = LRUCache(
+            max_entries=current_app.config['USER_CACHE_SIZE'],
+            default_timeout=current_app.config['USER_CACHE_TTL'])
+    return cache
+
+def invalidate_user(user_id):
+    if current_app and 'user_cache' in current_app.extensions:
+        current_app.extensions['user_cache'].delete(user_id)
 
 @login.user_loader
 def load_user(id):
-    return db.session.get(User, int(id))
-
-workout_machine_exercise = Table('workout_exercise', db.metadata, 
-                                 Column('workout_id', Integer, ForeignKey('workout.id'), primary_key=True),
-                                 Column('exercise_id', Integer, ForeignKey('exercise.id'), primary_key=True)
-                                )
+    cache = user_cache()
+    values = cache.get(int(id))
+    if values is None:
+        user = db.session.get(User, int(id))
+        if user is not None:
+            # data_version is left out: other workers bump it, and ETags and page caches must see it fresh
+            cache.set(user.id, {column.key: getattr(user, column.key)
+                                for column in User.__table__.columns if column.key != 'data_version'})
+        return user
+    user = User(**values)
+    make_transient_to_detached(user)
+    # Attach the cached row without a SELECT, then read the fresh data_version. That read also
+    # catches an account deleted by another worker, whose cache still holds the row
+    user = db.session.merge(user, load=False)
+    db.session.expire(user, ['data_version'])
+    try:
+        user.data_version
+    except ObjectDeletedError:
+        cache.delete(user.id)
+        db.session.expunge(user)
+        return None
+    return user
 
 class User(UserMixin, db.Model):
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -28,24 +63,36 @@ class User(UserMixin, db.Model):
     about_me: Mapped[Optional[str]] = mapped_column(String(140))
     last_seen: Mapped[Optional[datetime]] = mapped_column(
         default=lambda: datetime.now(timezone.utc))
+    data_version: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
 
     def __repr__(self):
         return '<User {}>'.format(self.username)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.check(self.password_hash, password)
     
     def avatar(self, size):
         digest = md5(self.email.lower().encode('utf-8')).hexdigest()
         return f'https://www.gravatar.com/avatar/{digest}?d=identicon&s={size}'
     
+    def delete_account(self):
+        # One set-based DELETE per table, children first, so nothing is loaded and nothing is orphaned
+        for model in (Exercise, WeeklyActivity, DailyActivity, Tombstone, Workout):
+            db.session.execute(sa.delete(model).where(model.user_id == self.id))
+        db.session.execute(sa.delete(User).where(User.id == self.id))
+
+    def bump_data_version(self):
+        # Incremented in SQL so concurrent workers never hand out the same version twice
+        self.data_version = User.data_version + 1
+
     def get_user_workouts(self):
         return self.workouts
     
     def get_reset_password_token(self, expires_in=600):
+        import jwt
         return jwt.encode(
             {'reset_password': self.id, 'exp': time() + expires_in},
             current_app.config['SECRET_KEY'], algorithm='HS256'
@@ -53,6 +100,7 @@ class User(UserMixin, db.Model):
     
     @staticmethod
     def verify_reset_password_token(token):
+        import jwt
         try:
             id = jwt.decode(token, current_app.config['SECRET_KEY'],
                             algorithms=['HS256'])['reset_password']
@@ -60,23 +108,321 @@ class User(UserMixin, db.Model):
             return
         return db.session.get(User, id)
 
+@sa.event.listens_for(User, 'after_update')
+@sa.event.listens_for(User, 'after_delete')
+def user_changed(mapper, connection, target):
+    invalidate_user(target.id)
+
+# SQLite keeps workout names in an external-content FTS5 table, maintained by triggers
+WORKOUT_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS workout_fts USING fts5(name, content='workout', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS workout_fts_insert AFTER INSERT ON workout BEGIN "
+    "INSERT INTO workout_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS workout_fts_delete AFTER DELETE ON workout BEGIN "
+    "INSERT INTO workout_fts(workout_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS workout_fts_update AFTER UPDATE OF name ON workout BEGIN "
+    "INSERT INTO workout_fts(workout_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO workout_fts(rowid, name) VALUES (new.id, new.name); END",
+]
+workout_fts = sa.table('workout_fts', sa.column('rowid'), sa.column('workout_fts'))
+
 class Workout(db.Model):
+    # Covers the workouts page (filter by muscle group, ordered by muscle group and name) and any
+    # lookup by user_id alone; Postgres searches names through a GIN index on their tsvector
+    __table_args__ = (
+        sa.Index('ix_workout_user_id_muscle_group_name', 'user_id', 'muscle_group', 'name'),
+        sa.Index('ix_workout_user_id_updated_at', 'user_id', 'updated_at', 'id'),
+        sa.Index('ix_workout_name_tsv', sa.text("to_tsvector('simple', name)"),
+                 postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
+    STALE_AFTER = timedelta(days=14)
+
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(64), index=True)
     exercise_type: Mapped[str] = mapped_column(String(64))
     muscle_group: Mapped[str] = mapped_column(String(64))
-    user_id: Mapped[int] = mapped_column(ForeignKey(User.id), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey(User.id))
     user: Mapped[User] = relationship(back_populates='workouts')
-    exercises: Mapped[List["Exercise"]] = relationship(secondary='workout_exercise', back_populates="workouts")
+    # The database deletes a workout's sets (ON DELETE CASCADE), so the ORM never loads them to do it
+    exercises: Mapped[List["Exercise"]] = relationship(back_populates="workout", passive_deletes=True)
     is_stale: Mapped[bool] = mapped_column(Boolean, default=False, nullable=True)
+    last_done: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+    # Bumped by every ORM or Core update, for /api/sync
+    updated_at: Mapped[datetime] = mapped_column(default=utcnow, onupdate=utcnow)
+    # Bumped by every write to the workout's sets; keys its cached progress
+    data_version: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+
+    @staticmethod
+    def last_done_by_workout(workout_ids):
+        # One grouped MAX(date) over the (workout_id, date) index instead of loading every workout's exercises
+        rows = db.session.execute(
+            sa.select(Exercise.workout_id, sa.func.max(Exercise.date))
+            .where(Exercise.workout_id.in_(workout_ids))
+            .group_by(Exercise.workout_id)
+        )
+        return dict(rows.all())
+
+    def refresh_last_done(self):
+        self.last_done = Workout.last_done_by_workout([self.id]).get(self.id)
+
+    def bump_data_version(self):
+        self.data_version = Workout.data_version + 1
+
+    def delete(self):
+        # Rollups are adjusted from one grouped read, then a single DELETE; the database removes the
+        # sets through ON DELETE CASCADE
+        days = set_totals(sa.func.date(Exercise.date, type_=sa.Date), Exercise.workout_id == self.id)
+        DailyActivity.remove(self.user_id, days)
+        WeeklyActivity.remove(self.user_id, self.category, days)
+        db.session.execute(sa.delete(Workout).where(Workout.id == self.id))
+        # One tombstone for the workout stands for all of its sets
+        Tombstone.record(self.user_id, 'workout', [self.id])
+
+    @property
+    def category(self):
+        return (self.muscle_group, self.exercise_type)
+
+    @staticmethod
+    def stale_clause(today):
+        return sa.or_(Workout.last_done.is_(None), Workout.last_done < today - Workout.STALE_AFTER)
+
+    @staticmethod
+    def name_matches(text):
+        # Prefix match on every word typed, through the full-text index of the database in use;
+        # None if there is nothing to search for
+        terms = re.findall(r'\w+', text.lower())
+        if not terms:
+            return None
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            match = ' '.join(f'"{term}"*' for term in terms)
+            return Workout.id.in_(sa.select(workout_fts.c.rowid).where(workout_fts.c.workout_fts.op('MATCH')(match)))
+        if dialect == 'postgresql':
+            # The config is inlined so the expression matches ix_workout_name_tsv
+            simple = sa.literal_column("'simple'")
+            query = ' & '.join(f'{term}:*' for term in terms)
+            return sa.func.to_tsvector(simple, Workout.name).bool_op('@@')(sa.func.to_tsquery(simple, query))
+        return sa.and_(*(Workout.name.ilike(f'%{term}%') for term in terms))
+
+for statement in WORKOUT_FTS_DDL:
+    sa.event.listen(Workout.__table__, 'after_create', sa.DDL(statement).execute_if(dialect='sqlite'))
+sa.event.listen(Workout.__table__, 'before_drop',
+                sa.DDL('DROP TABLE IF EXISTS workout_fts').execute_if(dialect='sqlite'))
 
 class Exercise(db.Model):
+    # Both indexes end in id to match the keyset ordering of the history views
+    __table_args__ = (
+        sa.Index('ix_exercise_workout_id_date', 'workout_id', 'date', 'id'),
+        sa.Index('ix_exercise_user_id_date', 'user_id', 'date', 'id'),
+        sa.Index('ix_exercise_user_id_updated_at', 'user_id', 'updated_at', 'id'),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
-    date: Mapped[datetime] = mapped_column(index=True, default=lambda: datetime.now(timezone.utc))
+    date: Mapped[datetime] = mapped_column(default=lambda: datetime.now(timezone.utc))
     count: Mapped[int] = mapped_column(Integer, nullable=True, default=None)
     weight: Mapped[int] = mapped_column(Integer, nullable=True, default=None)
     distance: Mapped[int] = mapped_column(Integer, nullable=True, default=None)
-    workouts: Mapped[List['Workout']] = relationship(secondary='workout_exercise', back_populates='exercises')
+    workout_id: Mapped[Optional[int]] = mapped_column(ForeignKey(Workout.id, ondelete='CASCADE'))
+    # Denormalized from the workout so per-user queries skip the join
+    user_id: Mapped[Optional[int]] = mapped_column(ForeignKey(User.id, ondelete='CASCADE'))
+    updated_at: Mapped[datetime] = mapped_column(default=utcnow, onupdate=utcnow)
+    workout: Mapped[Optional[Workout]] = relationship(back_populates='exercises')
+    user: Mapped[Optional[User]] = relationship()
+
+    @validates('workout')
+    def validate_workout(self, key, workout):
+        if workout is not None and self.user is None:
+            self.user = workout.user
+        return workout
+
+    def __repr__(self):
+        return '<Exercise weight {}>'.format(self.weight)
+
+    @property
+    def set_values(self):
+        return (self.date, self.weight, self.count, self.distance)
+
+def upsert(table, rows, index_elements, increments):
+    # INSERT ... ON CONFLICT DO UPDATE adding to the existing counters, supported by SQLite and Postgres
+    dialect = db.session.get_bind().dialect.name
+    # Dialect modules are imported on first use; only the one in use is ever loaded
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={name: table.c[name] + stmt.excluded[name] for name in increments}
+    )
+    # executemany keeps the compiled statement cacheable whatever the number of rows
+    db.session.execute(stmt, rows)
+
+def set_totals(key, where):
+    # (key, set count, volume, distance) for the matching sets, grouped in SQL; lets the rollups be
+    # adjusted for a whole workout without loading its sets
+    return db.session.execute(
+        sa.select(key, sa.func.count(),
+                  sa.func.sum(sa.func.coalesce(Exercise.weight, 0) * sa.func.coalesce(Exercise.count, 0)),
+                  sa.func.sum(sa.func.coalesce(Exercise.distance, 0)))
+        .where(where)
+        .group_by(key)
+    ).all()
+
+class DailyActivity(db.Model):
+    # Per-user daily rollup behind the activity calendar, updated in the same transaction as exercise writes
+    __tablename__ = 'daily_activity'
+    user_id: Mapped[int] = mapped_column(ForeignKey(User.id), primary_key=True)
+    day: Mapped[date] = mapped_column(sa.Date, primary_key=True)
+    set_count: Mapped[int] = mapped_column(Integer, default=0)
+    volume: Mapped[int] = mapped_column(Integer, default=0)
+    distance: Mapped[int] = mapped_column(Integer, default=0)
+
+    def __repr__(self):
+        return '<DailyActivity {} {}>'.format(self.user_id, self.day)
+
+    @staticmethod
+    def record(user_id, sets, sign=1):
+        # sets are (date, weight, count, distance) tuples; sign=-1 removes them from the rollup
+        totals = defaultdict(lambda: [0, 0, 0])
+        for day, weight, count, distance in sets:
+            total = totals[day.date() if isinstance(day, datetime) else day]
+            total[0] += sign
+            total[1] += sign * (weight or 0) * (count or 0)
+            total[2] += sign * (distance or 0)
+        if not totals:
+            return
+        rows = [{'user_id': user_id, 'day': day, 'set_count': set_count, 'volume': volume, 'distance': distance}
+                for day, (set_count, volume, distance) in totals.items()]
+        upsert(DailyActivity.__table__, rows, ['user_id', 'day'], ['set_count', 'volume', 'distance'])
+
+    @staticmethod
+    def remove(user_id, days):
+        # days are (day, set count, volume, distance) totals, as returned by set_totals
+        rows = [{'user_id': user_id, 'day': day, 'set_count': -set_count, 'volume': -volume, 'distance': -distance}
+                for day, set_count, volume, distance in days]
+        if rows:
+            upsert(DailyActivity.__table__, rows, ['user_id', 'day'], ['set_count', 'volume', 'distance'])
+
+    @staticmethod
+    def rebuild(user_id):
+        # Recompute a user's rollup from scratch with one grouped INSERT ... SELECT
+        db.session.execute(sa.delete(DailyActivity).where(DailyActivity.user_id == user_id))
+        day = sa.func.date(Exercise.date)
+        grouped = (
+            sa.select(
+                Exercise.user_id, day, sa.func.count(),
+                sa.func.sum(sa.func.coalesce(Exercise.weight, 0) * sa.func.coalesce(Exercise.count, 0)),
+                sa.func.sum(sa.func.coalesce(Exercise.distance, 0))
+            )
+            .where(Exercise.user_id == user_id, Exercise.workout_id.is_not(None))
+            .group_by(Exercise.user_id, day)
+        )
+        db.session.execute(sa.insert(DailyActivity).from_select(
+            ['user_id', 'day', 'set_count', 'volume', 'distance'], grouped))
+
+
+def week_of(day):
+    # Weeks start on Monday, as in ISO 8601
+    if isinstance(day, datetime):
+        day = day.date()
+    return day - timedelta(days=day.weekday())
+
+def week_start_sql(column):
+    # The SQL equivalent of week_of for the database in use
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return sa.cast(sa.func.date_trunc('week', column), sa.Date)
+    return sa.func.date(column, 'weekday 0', '-6 days', type_=sa.Date)
+
+class WeeklyActivity(db.Model):
+    # Per-user weekly totals by muscle group and exercise type behind the dashboard, kept current
+    # in the same transaction as exercise writes like DailyActivity
+    __tablename__ = 'weekly_activity'
+    user_id: Mapped[int] = mapped_column(ForeignKey(User.id), primary_key=True)
+    week: Mapped[date] = mapped_column(sa.Date, primary_key=True)
+    muscle_group: Mapped[str] = mapped_column(String(64), primary_key=True)
+    exercise_type: Mapped[str] = mapped_column(String(64), primary_key=True)
+    set_count: Mapped[int] = mapped_column(Integer, default=0)
+    volume: Mapped[int] = mapped_column(Integer, default=0)
+    distance: Mapped[int] = mapped_column(Integer, default=0)
+
+    def __repr__(self):
+        return '<WeeklyActivity {} {} {} {}>'.format(self.user_id, self.week, self.muscle_group, self.exercise_type)
+
+    @staticmethod
+    def record(user_id, category, sets, sign=1):
+        # sets are (date, weight, count, distance) tuples under one (muscle_group, exercise_type)
+        # category; sign=-1 removes them
+        totals = defaultdict(lambda: [0, 0, 0])
+        for day, weight, count, distance in sets:
+            total = totals[week_of(day)]
+            total[0] += sign
+            total[1] += sign * (weight or 0) * (count or 0)
+            total[2] += sign * (distance or 0)
+        WeeklyActivity.add(user_id, *category, totals.items())
+
+    @staticmethod
+    def add(user_id, muscle_group, exercise_type, totals):
+        rows = [{'user_id': user_id, 'week': week, 'muscle_group': muscle_group, 'exercise_type': exercise_type,
+                 'set_count': set_count, 'volume': volume, 'distance': distance}
+                for week, (set_count, volume, distance) in totals]
+        if rows:
+            upsert(WeeklyActivity.__table__, rows, ['user_id', 'week', 'muscle_group', 'exercise_type'],
+                   ['set_count', 'volume', 'distance'])
+
+    @staticmethod
+    def recategorise(workout, old_muscle_group, old_exercise_type):
+        # Moves a workout's sets to its new muscle group / exercise type with one grouped read
+        totals = [(week, values) for week, *values in set_totals(week_start_sql(Exercise.date),
+                                                                Exercise.workout_id == workout.id)]
+        WeeklyActivity.add(workout.user_id, old_muscle_group, old_exercise_type,
+                           [(week, [-value for value in values]) for week, values in totals])
+        WeeklyActivity.add(workout.user_id, workout.muscle_group, workout.exercise_type, totals)
+
+    @staticmethod
+    def remove(user_id, category, days):
+        # days are per-day totals of one workout, as returned by set_totals
+        totals = defaultdict(lambda: [0, 0, 0])
+        for day, set_count, volume, distance in days:
+            total = totals[week_of(day)]
+            total[0] -= set_count
+            total[1] -= volume
+            total[2] -= distance
+        WeeklyActivity.add(user_id, *category, totals.items())
+
+    @staticmethod
+    def rebuild(user_id):
+        # Recompute a user's rollup from scratch with one grouped INSERT ... SELECT
+        db.session.execute(sa.delete(WeeklyActivity).where(WeeklyActivity.user_id == user_id))
+        week = week_start_sql(Exercise.date)
+        grouped = (
+            sa.select(
+                Exercise.user_id, week, Workout.muscle_group, Workout.exercise_type, sa.func.count(),
+                sa.func.sum(sa.func.coalesce(Exercise.weight, 0) * sa.func.coalesce(Exercise.count, 0)),
+                sa.func.sum(sa.func.coalesce(Exercise.distance, 0))
+            )
+            .join(Workout, Workout.id == Exercise.workout_id)
+            .where(Exercise.user_id == user_id)
+            .group_by(Exercise.user_id, week, Workout.muscle_group, Workout.exercise_type)
+        )
+        db.session.execute(sa.insert(WeeklyActivity).from_select(
+            ['user_id', 'week', 'muscle_group', 'exercise_type', 'set_count', 'volume', 'distance'], grouped))
+
+
+class Tombstone(db.Model):
+    # Deleted workouts and sets, so sync clients can drop their copies; purged after SYNC_TOMBSTONE_DAYS
+    __table_args__ = (
+        sa.Index('ix_tombstone_user_id_deleted_at', 'user_id', 'deleted_at', 'id'),
+    )
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey(User.id, ondelete='CASCADE'))
+    kind: Mapped[str] = mapped_column(String(16))
+    object_id: Mapped[int] = mapped_column(Integer)
+    deleted_at: Mapped[datetime] = mapped_column(default=utcnow, index=True)
 
     def __repr__(self):
-        return '<Exercise weight {}>'.format(self.weight)
\ No newline at end of file
+        return '<Tombstone {} {}>'.format(self.kind, self.object_id)
+
+    @staticmethod
+    def record(user_id, kind, ids):
+        db.session.execute(sa.insert(Tombstone), [{'user_id': user_id, 'kind': kind, 'object_id': id}
+                                                  for id in ids])
@@ -0,0 +1,52 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+import sqlalchemy as sa
+from app import db
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, prev_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def encode_cursor(date, id):
+    payload = json.dumps([date.isoformat(), id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor):
+    # Returns (date, id), or None when the cursor has been tampered with
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        date, id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(date), int(id)
+    except (binascii.Error, ValueError, TypeError, AttributeError):
+        return None
+
+
+def keyset_page(query, date_column, id_column, per_page, after=None, before=None):
+    # Seeks on (date DESC, id DESC) with a row-value comparison the index can range-scan instead of
+    # using OFFSET, and fetches one extra row instead of issuing a COUNT(*)
+    if before is not None:
+        date, id = before
+        query = query.where(sa.tuple_(date_column, id_column) > sa.tuple_(date, id))
+        rows = db.session.scalars(query.order_by(date_column.asc(), id_column.asc()).limit(per_page + 1)).all()
+        has_newer = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        has_older = True
+    else:
+        if after is not None:
+            date, id = after
+            query = query.where(sa.tuple_(date_column, id_column) < sa.tuple_(date, id))
+        rows = db.session.scalars(query.order_by(date_column.desc(), id_column.desc()).limit(per_page + 1)).all()
+        has_older = len(rows) > per_page
+        items = rows[:per_page]
+        has_newer = after is not None
+
+    next_cursor = encode_cursor(items[-1].date, items[-1].id) if items and has_older else None
+    prev_cursor = encode_cursor(items[0].date, items[0].id) if items and has_newer else None
+    return KeysetPage(items, next_cursor, prev_cursor)
@@ -0,0 +1,70 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingPoolBusy(Exception):
+    pass
+
+
+class PasswordState:
+    def __init__(self, slots):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.slots = threading.BoundedSemaphore(slots)
+
+
+class Passwords:
+    # Runs password hashing in a bounded process pool so a burst of logins cannot pin the web worker
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+        app.config.setdefault('PASSWORD_HASH_QUEUE', 8)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10)
+        app.extensions['passwords'] = PasswordState(
+            max(app.config['PASSWORD_HASH_WORKERS'], 1) + app.config['PASSWORD_HASH_QUEUE'])
+
+    def executor(self, state):
+        # Created on first use so each gunicorn worker gets its own pool after forking
+        with state.lock:
+            if state.executor is None:
+                state.executor = ProcessPoolExecutor(
+                    max_workers=current_app.config['PASSWORD_HASH_WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn'))
+            return state.executor
+
+    def run(self, fn, *args):
+        if not current_app.config['PASSWORD_HASH_WORKERS']:
+            return fn(*args)
+        state = current_app.extensions['passwords']
+        if not state.slots.acquire(blocking=False):
+            raise HashingPoolBusy()
+        try:
+            future = self.executor(state).submit(fn, *args)
+        except BaseException:
+            state.slots.release()
+            raise
+        # The slot is held until the hash actually finishes, not just until this request gives up on it
+        future.add_done_callback(lambda _: state.slots.release())
+        try:
+            return future.result(timeout=current_app.config['PASSWORD_HASH_TIMEOUT'])
+        except TimeoutError:
+            raise HashingPoolBusy()
+
+    def hash(self, password):
+        return self.run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+    def check(self, password_hash, password):
+        if not password_hash:
+            return False
+        return self.run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        # Werkzeug hashes start with the full method string, e.g. scrypt:32768:8:1$salt$hash
+        return password_hash.split('$', 1)[0] != current_app.config['PASSWORD_HASH_METHOD']
@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+import time
+import sqlalchemy as sa
+from sqlalchemy.pool import QueuePool
+
+# Used when the DB_* setting is not given; SQLite files are local, so no recycling or pre-ping
+DRIVER_DEFAULTS = {
+    'postgresql': {'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30.0,
+                   'pool_recycle': 1800, 'pool_pre_ping': True, 'statement_timeout': 30000},
+    'sqlite': {'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30.0,
+               'pool_recycle': -1, 'pool_pre_ping': False, 'statement_timeout': 5000},
+}
+SETTINGS = {'pool_size': 'DB_POOL_SIZE', 'max_overflow': 'DB_MAX_OVERFLOW',
+            'pool_timeout': 'DB_POOL_TIMEOUT', 'pool_recycle': 'DB_POOL_RECYCLE',
+            'pool_pre_ping': 'DB_POOL_PRE_PING', 'statement_timeout': 'DB_STATEMENT_TIMEOUT'}
+
+
+@sa.event.listens_for(sa.pool.Pool, 'connect')
+def sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite only enforces foreign keys, and so ON DELETE CASCADE, on connections that ask for it
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool that also records how long checkouts wait and how many time out
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats_lock = threading.Lock()
+        self.checkouts = self.timeouts = 0
+        self.wait_time = self.max_wait = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa.exc.TimeoutError:
+            with self.stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self.stats_lock:
+                self.checkouts += 1
+                self.wait_time += waited
+                self.max_wait = max(self.max_wait, waited)
+
+
+def setting(config, option, default):
+    value = config.get(SETTINGS[option])
+    if value is None or value == '':
+        return default
+    if isinstance(default, bool):
+        return value if isinstance(value, bool) else str(value).lower() in ('1', 'true', 'yes')
+    return type(default)(value)
+
+
+def engine_options(config):
+    url = sa.engine.make_url(config['SQLALCHEMY_DATABASE_URI'])
+    backend = url.get_backend_name()
+    if backend == 'sqlite' and url.database in (None, '', ':memory:'):
+        # In-memory databases share one connection through StaticPool
+        return {}
+    defaults = DRIVER_DEFAULTS.get(backend, DRIVER_DEFAULTS['postgresql'])
+    options = {option: setting(config, option, default) for option, default in defaults.items()}
+    statement_timeout = options.pop('statement_timeout')
+    options['poolclass'] = TimedQueuePool
+    if backend == 'postgresql' and url.get_driver_name() == 'psycopg2' and statement_timeout:
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    elif backend == 'sqlite':
+        # SQLite has no statement timeout; the nearest knob is how long a statement waits on a lock
+        options['connect_args'] = {'timeout': statement_timeout / 1000}
+    return options
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {}
+    stats = {'size': pool.size(), 'checked_in': pool.checkedin(),
+             'checked_out': pool.checkedout(), 'overflow': max(pool.overflow(), 0)}
+    if isinstance(pool, TimedQueuePool):
+        with pool.stats_lock:
+            stats.update(checkouts=pool.checkouts, timeouts=pool.timeouts,
+                         wait_seconds=pool.wait_time, max_wait_seconds=pool.max_wait)
+    return stats
@@ -0,0 +1,71 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from app import db
+from app.models import Workout, Exercise, Tombstone, utcnow
+
+# Each stream is read in (timestamp, id) order through its (user_id, timestamp, id) index; the
+# sync cursor holds the position reached in every stream, the time of the sync and whether it
+# finished. Timestamps are taken at flush, not at commit, so a transaction can commit rows behind
+# a position a client has already passed; a new sync therefore re-reads an overlap window behind
+# each position, and clients dedupe what it returns by id
+STREAMS = {
+    'workouts': (Workout, Workout.updated_at),
+    'exercises': (Exercise, Exercise.updated_at),
+    'deleted': (Tombstone, Tombstone.deleted_at),
+}
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def encode_sync_cursor(synced_at, positions, complete):
+    payload = {'at': synced_at.isoformat(), 'done': complete,
+               'pos': {name: [ts.isoformat(), id] for name, (ts, id) in positions.items()}}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).rstrip(b'=').decode()
+
+
+def decode_sync_cursor(cursor):
+    # Returns (synced_at, {stream: (timestamp, id)}, complete), or None when the cursor has been tampered with
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        positions = {name: (datetime.fromisoformat(ts), int(id)) for name, (ts, id) in payload['pos'].items()
+                     if name in STREAMS}
+        return datetime.fromisoformat(payload['at']), positions, bool(payload.get('done', True))
+    except (binascii.Error, ValueError, TypeError, AttributeError, KeyError):
+        return None
+
+
+def changes(user_id, synced_at, positions, complete, batch_size, retention_days, overlap):
+    # Up to batch_size rows from each stream past the cursor. A cursor older than the tombstone
+    # retention may have missed deletes that are already purged, so the client must start over.
+    # Pages within one sync follow the exact positions, so a busy overlap window cannot stall them
+    now = utcnow()
+    if synced_at is not None and synced_at < now - timedelta(days=retention_days):
+        raise CursorExpired()
+
+    batches, more = {}, False
+    positions = dict(positions)
+    for name, (model, column) in STREAMS.items():
+        query = sa.select(model).where(model.user_id == user_id)
+        if name in positions and complete and overlap:
+            query = query.where(column > positions[name][0] - overlap)
+        elif name in positions:
+            query = query.where(sa.tuple_(column, model.id) > sa.tuple_(*positions[name]))
+        rows = db.session.scalars(query.order_by(column, model.id).limit(batch_size + 1)).all()
+        if len(rows) > batch_size:
+            rows, more = rows[:batch_size], True
+        if rows:
+            positions[name] = (getattr(rows[-1], column.key), rows[-1].id)
+        batches[name] = rows
+    return batches, encode_sync_cursor(now, positions, not more), more
+
+
+def purge_tombstones(retention_days):
+    result = db.session.execute(sa.delete(Tombstone).where(
+        Tombstone.deleted_at < utcnow() - timedelta(days=retention_days)))
+    return result.rowcount
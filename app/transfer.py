@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import datetime
+import sqlalchemy as sa
+from app import db
+from app.models import Workout, Exercise, DailyActivity, WeeklyActivity
+
+FIELDS = ['workout', 'exercise_type', 'muscle_group', 'date', 'weight', 'count', 'distance']
+FORMATS = ('csv', 'jsonl')
+MIMETYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+class TransferError(ValueError):
+    pass
+
+
+def export_rows(user_id, batch_size=1000):
+    # Plain column tuples streamed through a server-side cursor, so memory does not grow with history
+    query = (
+        sa.select(Workout.name, Workout.exercise_type, Workout.muscle_group,
+                  Exercise.date, Exercise.weight, Exercise.count, Exercise.distance)
+        .outerjoin(Exercise, Exercise.workout_id == Workout.id)
+        .where(Workout.user_id == user_id)
+        .order_by(Workout.id, Exercise.date, Exercise.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in db.session.execute(query):
+        values = dict(zip(FIELDS, row))
+        if values['date'] is not None:
+            values['date'] = values['date'].isoformat()
+        yield values
+
+
+def export_csv(user_id):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+    writer.writeheader()
+    for values in export_rows(user_id):
+        writer.writerow(values)
+        if buffer.tell() > 65536:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_jsonl(user_id):
+    for values in export_rows(user_id):
+        yield json.dumps(values) + '\n'
+
+
+def read_rows(lines, fmt):
+    # Parses the export format one line at a time
+    if fmt == 'csv':
+        yield from csv.DictReader(lines)
+    else:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+
+def numbered(rows):
+    # Decoding and parsing happen while the rows are read, so their errors are reported here
+    line_number = 0
+    try:
+        for line_number, row in enumerate(rows, start=1):
+            yield line_number, row
+    except UnicodeDecodeError:
+        # The upload is decoded in chunks, so there is no row to point at
+        raise TransferError('the file is not UTF-8 text')
+    except (ValueError, csv.Error) as e:
+        raise TransferError(f'row {line_number + 1}: unreadable ({e})')
+
+
+def to_int(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise ValueError(value)
+    return int(value)
+
+
+def import_rows(user, rows, batch_size=1000):
+    # Batches bound the size of each insert, but everything commits together at the end: a bad
+    # row leaves nothing behind, so fixing the file and importing it again cannot duplicate sets
+    workout_ids = {
+        (w.name, w.exercise_type, w.muscle_group): w.id
+        for w in db.session.execute(sa.select(Workout.name, Workout.exercise_type, Workout.muscle_group,
+                                              Workout.id).where(Workout.user_id == user.id))
+    }
+    touched = set()
+    batch = []
+    imported = 0
+
+    def flush():
+        db.session.execute(sa.insert(Exercise), [dict(values, workout_id=workout_ids[key], user_id=user.id)
+                                                 for key, values in batch])
+        by_category = defaultdict(list)
+        for (name, exercise_type, muscle_group), v in batch:
+            by_category[(muscle_group, exercise_type)].append((v['date'], v['weight'], v['count'], v['distance']))
+        DailyActivity.record(user.id, [values for sets in by_category.values() for values in sets])
+        for category, sets in by_category.items():
+            WeeklyActivity.record(user.id, category, sets)
+        batch.clear()
+
+    for line_number, row in numbered(rows):
+        try:
+            key = (row['workout'], row['exercise_type'], row['muscle_group'])
+            values = None
+            if row.get('date'):
+                values = {'date': datetime.fromisoformat(row['date']), 'weight': to_int(row.get('weight')),
+                          'count': to_int(row.get('count')), 'distance': to_int(row.get('distance'))}
+        except (KeyError, TypeError, ValueError) as e:
+            raise TransferError(f'row {line_number}: invalid value {e}')
+        if not all(isinstance(field, str) and field for field in key):
+            raise TransferError(f'row {line_number}: workout, exercise_type and muscle_group are required')
+
+        if key not in workout_ids:
+            workout = Workout(name=key[0], exercise_type=key[1], muscle_group=key[2], user_id=user.id)
+            db.session.add(workout)
+            db.session.flush()
+            workout_ids[key] = workout.id
+        if values is None:
+            continue
+        batch.append((key, values))
+        touched.add(workout_ids[key])
+        imported += 1
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    last_done = Workout.last_done_by_workout(touched) if touched else {}
+    if last_done:
+        db.session.execute(sa.update(Workout), [{'id': workout_id, 'last_done': done}
+                                                for workout_id, done in last_done.items()])
+    if touched:
+        db.session.execute(sa.update(Workout).where(Workout.id.in_(touched))
+                           .values(data_version=Workout.data_version + 1))
+    user.bump_data_version()
+    db.session.commit()
+    return imported
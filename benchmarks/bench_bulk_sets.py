@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# Throughput of POST /api/workouts/<id>/exercises at 1, 10 and 1000 sets per call,
+# against the one-set-per-POST log_exercise form.
+# Run with: python -m benchmarks.bench_bulk_sets
+import time
+from benchmarks.common import make_app, seed_user, login
+
+
+def main(total=5000):
+    app = make_app()
+    user = seed_user(workouts=1, sets=0)
+    workout = user.workouts.first()
+    client = app.test_client()
+    login(client, user)
+
+    start = time.perf_counter()
+    for _ in range(total // 10):
+        client.post(f'/log-exercise/{workout.id}', data={'date': '2025-03-01', 'weight': 100, 'count': 5})
+    elapsed = time.perf_counter() - start
+    print(f'form, 1 set per POST: {total // 10 / elapsed:10.0f} sets/s')
+
+    for batch in (1, 10, 1000):
+        sets = [{'date': '2025-03-01', 'weight': 100, 'count': 5}] * batch
+        calls = max(total // batch, 1) if batch > 1 else total // 10
+        start = time.perf_counter()
+        for _ in range(calls):
+            response = client.post(f'/api/workouts/{workout.id}/exercises', json={'sets': sets})
+            assert response.status_code == 201
+        elapsed = time.perf_counter() - start
+        print(f'api, {batch:4d} sets per call: {calls * batch / elapsed:10.0f} sets/s '
+              f'({elapsed / calls * 1000:.2f} ms/call)')
+
+
+if __name__ == '__main__':
+    main()
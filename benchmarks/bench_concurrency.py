@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# Requests per second and p99 for /api/workouts at 100+ concurrent clients under gunicorn sync
+# and gthread workers: the numbers an ASGI deployment of the JSON API would have to beat.
+# Run with: python -m benchmarks.bench_concurrency [--clients 100] [--duration 5]
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.common import BenchConfig
+from benchmarks.generator import generate
+from app import create_app, db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET_KEY = 'bench'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def seed(uri):
+    # Seeds the database and returns a session cookie for the generated user
+    config = type('SeedConfig', (BenchConfig,), {'SQLALCHEMY_DATABASE_URI': uri, 'SECRET_KEY': SECRET_KEY})
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        user = generate(users=1, years=2)[0]
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user.id)
+            sess['_fresh'] = True
+        cookie = client.get_cookie('session').value
+        db.engine.dispose()
+    return cookie
+
+
+async def client_loop(port, path, cookie, deadline, latencies):
+    request = (f'GET {path} HTTP/1.1\r\nHost: localhost\r\nCookie: session={cookie}\r\n'
+               'Connection: close\r\n\r\n').encode()
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        if not response.startswith(b'HTTP/1.1 200'):
+            raise RuntimeError(response[:200])
+        latencies.append(time.perf_counter() - start)
+
+
+async def load(port, path, cookie, clients, duration):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(client_loop(port, path, cookie, deadline, latencies) for _ in range(clients)))
+    return latencies
+
+
+def wait_for(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('gunicorn did not start')
+
+
+def run(uri, cookie, worker_args, args):
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=uri, SECRET_KEY=SECRET_KEY)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-b', f'127.0.0.1:{port}', '--backlog', '2048',
+         *worker_args, 'app:create_app()'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(port)
+        asyncio.run(load(port, args.path, cookie, 4, 1))
+        latencies = sorted(asyncio.run(load(port, args.path, cookie, args.clients, args.duration)))
+    finally:
+        server.terminate()
+        server.wait()
+    p99 = latencies[int(0.99 * (len(latencies) - 1))]
+    return len(latencies) / args.duration, p99
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--path', default='/api/workouts')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = f'sqlite:///{tmp}/bench.db'
+        cookie = seed(uri)
+        workers = ['-w', str(args.workers)]
+        setups = [('sync worker', workers + ['-k', 'sync']),
+                  (f'gthread x{args.threads}', workers + ['-k', 'gthread', '--threads', str(args.threads)])]
+        for label, worker_args in setups:
+            rps, p99 = run(uri, cookie, worker_args, args)
+            print(f'{label:12} {rps:7.1f} req/s  p99 {p99 * 1000:7.1f} ms ({args.clients} clients)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# Times /api/dashboard, read from the weekly rollup, against the same GROUP BY run directly over
+# the exercise history, for 1-, 3- and 10-year histories and 12- and 520-week windows.
+# Run with: python -m benchmarks.bench_dashboard
+import random
+from datetime import date, datetime, timedelta
+import sqlalchemy as sa
+from flask import g
+from benchmarks.common import make_app, login, count_queries, timed
+from benchmarks.generator import generate_user
+from app import db
+from app.models import Exercise, Workout, week_of, week_start_sql
+
+
+def direct(user_id, weeks):
+    week = week_start_sql(Exercise.date)
+    start = datetime.combine(week_of(date.today()) - timedelta(weeks=weeks - 1), datetime.min.time())
+    return db.session.execute(
+        sa.select(week, Workout.muscle_group, Workout.exercise_type, sa.func.count(),
+                  sa.func.sum(sa.func.coalesce(Exercise.weight, 0) * sa.func.coalesce(Exercise.count, 0)),
+                  sa.func.sum(sa.func.coalesce(Exercise.distance, 0)))
+        .join(Workout, Workout.id == Exercise.workout_id)
+        .where(Exercise.user_id == user_id, Exercise.date >= start)
+        .group_by(week, Workout.muscle_group, Workout.exercise_type)
+    ).all()
+
+
+def main():
+    app = make_app()
+    rng = random.Random(1)
+    for years in (1, 3, 10):
+        user = generate_user(rng, f'athlete{years}', years=years, end=datetime.now())
+        sets = db.session.scalar(sa.select(sa.func.count()).where(Exercise.user_id == user.id))
+        client = app.test_client()
+        login(client, user)
+        g.pop('_login_user', None)
+        for weeks in (12, 520):
+            url = f'/api/dashboard?weeks={weeks}'
+            statements = []
+            with count_queries(statements):
+                assert client.get(url).status_code == 200
+            endpoint, _ = timed(lambda: client.get(url), repeat=20)
+            scan, _ = timed(lambda: direct(user.id, weeks), repeat=5)
+            print(f'{years:2d} years ({sets:6d} sets), {weeks:3d} weeks: dashboard {endpoint * 1000:6.2f} ms '
+                  f'({len(statements)} queries), GROUP BY over exercises {scan * 1000:7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# Compares page 1 with page 1000 of a workout's exercise history, HTML and JSON.
+# Run with: python -m benchmarks.bench_history_pages
+import sqlalchemy as sa
+from benchmarks.common import make_app, seed_user, login, count_queries, timed
+from app import db
+from app.models import Exercise
+from app.pagination import encode_cursor
+
+
+def main():
+    app = make_app()
+    user = seed_user(workouts=1, sets=50000)
+    workout = user.workouts.first()
+    per_page = app.config['WORKOUTS_PER_PAGE']
+    client = app.test_client()
+    login(client, user)
+
+    # Cursor for the last row of page 999, looked up once outside the timed section
+    row = db.session.execute(sa.select(Exercise.date, Exercise.id)
+                             .order_by(Exercise.date.desc(), Exercise.id.desc())
+                             .offset(999 * per_page - 1).limit(1)).one()
+    deep = encode_cursor(row.date, row.id)
+
+    for label, url in (('html page 1', f'/log-exercise/{workout.id}'),
+                       ('html page 1000', f'/log-exercise/{workout.id}?after={deep}'),
+                       ('api page 1', f'/api/workouts/{workout.id}/exercises'),
+                       ('api page 1000', f'/api/workouts/{workout.id}/exercises?after={deep}')):
+        statements = []
+        with count_queries(statements):
+            assert client.get(url).status_code == 200
+        best, mean = timed(lambda: client.get(url), repeat=20)
+        print(f'{label:15s} {len(statements)} queries, best {best * 1000:.2f} ms, mean {mean * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
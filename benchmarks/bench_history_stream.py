@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# Time to first byte, total time and peak memory of the streamed all-history page for
+# workouts with 50, 5,000 and 50,000 sets.
+# Run with: python -m benchmarks.bench_history_stream
+import time
+import tracemalloc
+from flask import g
+from benchmarks.common import make_app, seed_user, login
+
+
+def measure(client, url):
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    assert response.status_code == 200
+    chunks = iter(response.response)
+    first = next(chunks)
+    first_byte = time.perf_counter() - start
+    size = len(first) + sum(len(chunk) for chunk in chunks)
+    response.close()
+    return first_byte, time.perf_counter() - start, size
+
+
+def main():
+    app = make_app()
+    for sets in (50, 5000, 50000):
+        user = seed_user(username=f'bench{sets}', workouts=1, sets=sets)
+        workout = user.workouts.first()
+        client = app.test_client()
+        login(client, user)
+        # The benchmark shares one app context, so drop the user Flask-Login cached for the last one
+        g.pop('_login_user', None)
+        url = f'/log-exercise/{workout.id}/history'
+
+        measure(client, url)
+        first_byte, total, size = measure(client, url)
+        tracemalloc.start()
+        measure(client, url)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f'{sets:6d} sets: first byte {first_byte * 1000:6.1f} ms, total {total * 1000:8.1f} ms, '
+              f'{size / 1024:7.0f} KiB sent, peak {peak / 1024:6.0f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# Serialization time of the stdlib and orjson JSON providers for large histories, and bytes on
+# the wire uncompressed, gzipped and (with brotli installed) brotli'd for the heaviest responses.
+# Run with: python -m benchmarks.bench_json [--years 3 10]
+import argparse
+import random
+from datetime import datetime
+import sqlalchemy as sa
+from flask import g
+from benchmarks.common import make_app, login, timed
+from benchmarks.generator import generate_user
+from app import db
+from app.compression import brotli
+from app.json_provider import JSONProvider, OrjsonProvider, orjson
+from app.models import DailyActivity, Exercise
+
+
+def payloads(user_id):
+    days = db.session.execute(sa.select(DailyActivity.day, DailyActivity.set_count)
+                              .where(DailyActivity.user_id == user_id).order_by(DailyActivity.day)).all()
+    sets = db.session.execute(sa.select(Exercise.id, Exercise.workout_id, Exercise.date, Exercise.weight,
+                                        Exercise.count, Exercise.distance)
+                              .where(Exercise.user_id == user_id).order_by(Exercise.date)).all()
+    return {
+        '/api/workouts pairs': [[day, value] for day, value in days],
+        'full set history': {'exercises': [{'id': id, 'workout_id': workout_id, 'date': date, 'weight': weight,
+                                            'count': count, 'distance': distance}
+                                           for id, workout_id, date, weight, count, distance in sets]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--years', type=int, nargs='+', default=[3, 10])
+    args = parser.parse_args()
+
+    app = make_app()
+    providers = [('stdlib', JSONProvider)] + ([('orjson', OrjsonProvider)] if orjson is not None else [])
+    encodings = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+    rng = random.Random(1)
+    for years in args.years:
+        user = generate_user(rng, f'athlete{years}', years=years, end=datetime.now())
+        sets = db.session.scalar(sa.select(sa.func.count()).where(Exercise.user_id == user.id))
+        print(f'{years} years, {sets} sets')
+
+        for name, payload in payloads(user.id).items():
+            results = []
+            for label, provider in providers:
+                app.json = provider(app)
+                best, _ = timed(lambda: app.json.response(payload), repeat=10)
+                size = len(app.json.response(payload).get_data())
+                results.append(f'{label} {best * 1000:7.2f} ms')
+            print(f'  serialize {name:20} {size / 1024:8.1f} KiB  ' + '  '.join(results))
+
+        app.json = providers[-1][1](app)
+        client = app.test_client()
+        login(client, user)
+        g.pop('_login_user', None)
+        workout_id = db.session.scalar(
+            sa.select(Exercise.workout_id).where(Exercise.user_id == user.id)
+            .group_by(Exercise.workout_id).order_by(sa.func.count().desc()).limit(1))
+        urls = ['/api/workouts', '/api/sync', '/workouts', '/', f'/log-exercise/{workout_id}/history']
+        for url in urls:
+            sizes = []
+            for encoding in encodings:
+                def fetch():
+                    response = client.get(url, headers={'Accept-Encoding': encoding})
+                    assert response.status_code == 200, url
+                    return response.get_data()
+                best, _ = timed(fetch, repeat=5)
+                sizes.append(f'{encoding} {len(fetch()) / 1024:7.1f} KiB ({best * 1000:6.1f} ms)')
+            print(f'  wire {url:30} ' + '  '.join(sizes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# Login throughput and the latency of concurrent non-auth requests (/api/workouts) while a
+# burst of logins runs, with inline hashing versus the hashing process pool.
+# Run with: python -m benchmarks.bench_login [seconds]
+import os
+import sys
+import tempfile
+import threading
+import time
+from benchmarks.common import BenchConfig, login
+from app import create_app, db
+from app.models import User
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(int(len(values) * pct / 100), len(values) - 1)] * 1000 if values else 0
+
+
+def run(workers, seconds, login_threads=8):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+
+    class Config(BenchConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+        PASSWORD_HASH_WORKERS = workers
+
+    app = create_app(Config)
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    stop = time.monotonic() + seconds
+    logins, latencies, busy = [], [], []
+
+    def log_in():
+        client = app.test_client()
+        while time.monotonic() < stop:
+            response = client.post('/auth/login', data={'username': 'bench', 'password': 'secret'})
+            (busy if response.status_code == 503 else logins).append(1)
+            client.get('/auth/logout')
+
+    def browse():
+        client = app.test_client()
+        with app.app_context():
+            login(client, db.session.get(User, user_id))
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            client.get('/api/workouts')
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=log_in) for _ in range(login_threads)]
+    threads.append(threading.Thread(target=browse))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    os.remove(path)
+
+    label = f'{workers} pool workers' if workers else 'inline hashing'
+    print(f'{label:16s} logins {len(logins) / seconds:6.1f}/s, 503s {len(busy):4d}, '
+          f'/api/workouts {len(latencies) / seconds:7.1f}/s '
+          f'p50 {percentile(latencies, 50):6.1f} ms p99 {percentile(latencies, 99):6.1f} ms')
+
+
+def main(seconds=5):
+    for workers in (0, 2):
+        run(workers, seconds)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# Times the progress analytics over a 100k-set history: load, vectorized compute and cached hit.
+# Run with: python -m benchmarks.bench_progress
+from benchmarks.common import make_app, seed_user, timed
+from app.analytics import load_history, compute_progress, workout_progress
+
+
+def main(sets=100000):
+    app = make_app()
+    user = seed_user(workouts=1, sets=sets)
+    workout = user.workouts.first()
+
+    with app.test_request_context():
+        history = load_history(workout.id)
+        for label, fn in (('load', lambda: load_history(workout.id)),
+                          ('compute', lambda: compute_progress(history)),
+                          ('cached', lambda: workout_progress(workout.id, user.data_version))):
+            best, mean = timed(fn)
+            print(f'{label:8s} {sets} sets: best {best * 1000:8.2f} ms, mean {mean * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# Cold-start latency in fresh interpreters: importing the app, create_app, the first
+# rendered page with and without a warm template bytecode cache, and the boot.sh migration
+# check against a no-op `flask db upgrade`.
+# Run with: python -m benchmarks.bench_startup
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHILD = '''
+import json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+app.config['TESTING'] = True
+response = app.test_client().get('/auth/login')
+assert response.status_code == 200
+served = time.perf_counter()
+print(json.dumps({'import': imported - start, 'create_app': created - imported,
+                  'first_request': served - created, 'total': served - start}))
+'''
+
+
+def run(args, env, repeat, ok=(0,)):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(args, cwd=ROOT, env=env, capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if result.returncode not in ok:
+            sys.exit(result.stderr)
+        timings.append((elapsed, result.stdout))
+    return timings
+
+
+def startup(env, repeat):
+    samples = [json.loads(out.strip().splitlines()[-1])
+               for _, out in run([sys.executable, '-c', CHILD], env, repeat)]
+    return {key: statistics.median(s[key] for s in samples) * 1000 for key in samples[0]}
+
+
+def main(repeat=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{tmp}/app.db',
+                   FLASK_APP='fitness-tracker.py', SECRET_KEY='bench')
+        env.pop('TEMPLATE_CACHE_DIR', None)
+        cold = startup(env, repeat)
+
+        cached_env = dict(env, TEMPLATE_CACHE_DIR=os.path.join(tmp, 'jinja'))
+        subprocess.run([sys.executable, '-m', 'flask', 'compile-templates'], cwd=ROOT, env=cached_env,
+                       capture_output=True, check=True)
+        warm = startup(cached_env, repeat)
+
+        for label, result in (('no bytecode cache', cold), ('warm bytecode cache', warm)):
+            print(f"{label:20} import {result['import']:6.1f} ms  create_app {result['create_app']:5.1f} ms  "
+                  f"first request {result['first_request']:5.1f} ms  total {result['total']:6.1f} ms")
+
+        subprocess.run([sys.executable, '-m', 'flask', 'db', 'upgrade'], cwd=ROOT, env=env,
+                       capture_output=True, check=True)
+        upgrade = statistics.median(t for t, _ in run([sys.executable, '-m', 'flask', 'db', 'upgrade'], env, repeat))
+        check = statistics.median(t for t, _ in run([sys.executable, 'check_db_head.py'], env, repeat))
+        print(f'schema at head: flask db upgrade {upgrade * 1000:.0f} ms, check_db_head.py {check * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
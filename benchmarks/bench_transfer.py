@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# Exports and re-imports a large history and checks Python heap usage stays under a fixed ceiling.
+# Run with: python -m benchmarks.bench_transfer [sets] [ceiling_mb]
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from benchmarks.common import make_app, seed_user
+from app import db, transfer
+from app.models import User
+
+
+def measure(label, fn, ceiling):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    print(f'{label}: {elapsed:.1f} s, peak {peak:.1f} MiB')
+    assert peak < ceiling, f'{label} peaked at {peak:.1f} MiB, ceiling is {ceiling} MiB'
+    return result
+
+
+def main(sets=1000000, ceiling=64):
+    make_app()
+    user = seed_user(workouts=50, sets=sets)
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        def export():
+            with open(path, 'w', newline='') as f:
+                for chunk in transfer.export_csv(user.id):
+                    f.write(chunk)
+        measure(f'export {sets} sets', export, ceiling)
+        print(f'file size: {os.path.getsize(path) / 2**20:.1f} MiB')
+
+        target = User(username='imported', email='imported@example.com')
+        db.session.add(target)
+        db.session.commit()
+
+        def load():
+            with open(path, newline='') as f:
+                return transfer.import_rows(target, transfer.read_rows(f, 'csv'))
+        count = measure(f'import {sets} sets', load, ceiling)
+        assert count == sets
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# Times the /workouts list for a 500-workout / 50k-set user.
+# Run with: python -m benchmarks.bench_workouts
+from benchmarks.common import make_app, seed_user, login, count_queries, timed
+
+
+def main():
+    app = make_app()
+    user = seed_user(workouts=500, sets=50000)
+    client = app.test_client()
+    login(client, user)
+
+    statements = []
+    with count_queries(statements):
+        response = client.get('/workouts')
+    assert response.status_code == 200
+
+    best, mean = timed(lambda: client.get('/workouts'))
+    print(f'/workouts: {len(statements)} queries, best {best * 1000:.1f} ms, mean {mean * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
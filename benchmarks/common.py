@@ -0,0 +1,86 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from app import create_app, db
+from app.models import User, Workout, Exercise, DailyActivity, WeeklyActivity
+from config import Config
+
+
+class BenchConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SECRET_KEY = 'bench'
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+
+def make_app(config_class=BenchConfig):
+    app = create_app(config_class)
+    ctx = app.app_context()
+    ctx.push()
+    db.create_all()
+    return app
+
+
+def seed_user(username='bench', workouts=500, sets=50000, seed=1):
+    # Core inserts so seeding a large history stays fast
+    rng = random.Random(seed)
+    user = User(username=username, email=f'{username}@example.com')
+    db.session.add(user)
+    db.session.commit()
+
+    workout_rows = [{'name': f'Workout {i}', 'exercise_type': 'free_weight',
+                     'muscle_group': 'chest', 'user_id': user.id, 'is_stale': False}
+                    for i in range(workouts)]
+    db.session.execute(sa.insert(Workout), workout_rows)
+    workout_ids = db.session.scalars(
+        sa.select(Workout.id).where(Workout.user_id == user.id)).all()
+
+    # Insert the history in chunks so seeding a million sets stays within a bounded footprint
+    start = datetime(2020, 1, 1)
+    for offset in range(0, sets, 50000):
+        chunk = min(50000, sets - offset)
+        exercise_rows = [{'date': start + timedelta(hours=rng.randrange(5 * 365 * 24)),
+                          'weight': rng.randrange(20, 300, 5), 'count': rng.randrange(1, 15),
+                          'workout_id': workout_ids[(offset + i) % len(workout_ids)], 'user_id': user.id}
+                         for i in range(chunk)]
+        db.session.execute(sa.insert(Exercise), exercise_rows)
+
+    last_done = Workout.last_done_by_workout(workout_ids)
+    db.session.execute(sa.update(Workout), [{'id': wid, 'last_done': last_done.get(wid)}
+                                            for wid in workout_ids])
+    DailyActivity.rebuild(user.id)
+    WeeklyActivity.rebuild(user.id)
+    db.session.commit()
+    return user
+
+
+def login(client, user):
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user.id)
+        sess['_fresh'] = True
+
+
+@contextmanager
+def count_queries(*args):
+    # count_queries(counter) inside an app context, or count_queries(engine, counter)
+    engine, counter = args if len(args) == 2 else (db.engine, args[0])
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter.append(statement)
+
+    sa.event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        sa.event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def timed(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), sum(timings) / len(timings)
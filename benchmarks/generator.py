@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# Seeded synthetic data: users with workouts in every WorkoutForm muscle group and
+# years of training history (a few sessions a week, progressive loads, cardio distances).
+# Run with: python -m benchmarks.generator --users 5 --years 3
+import argparse
+import random
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from benchmarks.common import make_app
+from app import db
+from app.main.forms import WorkoutForm
+from app.models import User, Workout, Exercise, DailyActivity, WeeklyActivity
+
+MUSCLE_GROUPS = [value for value, label in WorkoutForm.muscle_group.kwargs['choices']]
+LIFTS = {'machine': ['Machine Press', 'Cable Row', 'Pulldown', 'Extension', 'Curl'],
+         'free_weight': ['Barbell Press', 'Dumbbell Row', 'Squat', 'Deadlift', 'Raise'],
+         'bodyweight': ['Push-up', 'Pull-up', 'Dip', 'Plank', 'Lunge']}
+CARDIO = ['Run', 'Bike', 'Row', 'Swim']
+SCALES = {'small': dict(users=1, years=1), 'medium': dict(users=3, years=3),
+          'large': dict(users=10, years=5)}
+
+
+def make_workouts(rng, user_id):
+    rows = []
+    for group in MUSCLE_GROUPS:
+        if group == 'heart':
+            rows += [{'name': name, 'exercise_type': 'cardio', 'muscle_group': group}
+                     for name in rng.sample(CARDIO, 2)]
+            continue
+        for exercise_type in rng.sample(sorted(LIFTS), 2):
+            name = f"{group.replace('_', ' ').title()} {rng.choice(LIFTS[exercise_type])}"
+            rows.append({'name': name, 'exercise_type': exercise_type, 'muscle_group': group})
+    for row in rows:
+        row.update(user_id=user_id, is_stale=rng.random() < 0.1)
+    return rows
+
+
+def make_sets(rng, workout, progress):
+    # One session of sets; loads climb about 30% over the whole history
+    base = workout['base']
+    if workout['exercise_type'] == 'cardio':
+        return [{'weight': None, 'count': rng.randrange(15, 60), 'distance': max(1, round(base * (1 + progress) / 20))}]
+    sets = []
+    for _ in range(rng.randrange(3, 6)):
+        if workout['exercise_type'] == 'bodyweight':
+            sets.append({'weight': 0, 'count': rng.randrange(5, 25), 'distance': None})
+        else:
+            weight = base * (1 + 0.3 * progress) * rng.uniform(0.9, 1.05)
+            sets.append({'weight': int(weight // 5 * 5), 'count': rng.randrange(3, 13), 'distance': None})
+    return sets
+
+
+def generate_user(rng, username, years=3, sessions_per_week=4, end=datetime(2025, 1, 1)):
+    user = User(username=username, email=f'{username}@example.com')
+    db.session.add(user)
+    db.session.commit()
+    db.session.execute(sa.insert(Workout), make_workouts(rng, user.id))
+    workouts = [{'id': w.id, 'exercise_type': w.exercise_type, 'base': rng.randrange(40, 200)}
+                for w in db.session.scalars(sa.select(Workout).where(Workout.user_id == user.id))]
+
+    days = years * 365
+    start = end - timedelta(days=days)
+    rows = []
+    for offset in range(days):
+        if rng.random() >= sessions_per_week / 7:
+            continue
+        day = start + timedelta(days=offset, hours=rng.randrange(6, 21))
+        for workout in rng.sample(workouts, rng.randrange(3, 6)):
+            for i, values in enumerate(make_sets(rng, workout, offset / days)):
+                rows.append(dict(values, date=day + timedelta(minutes=3 * i),
+                                 workout_id=workout['id'], user_id=user.id))
+        if len(rows) >= 50000:
+            db.session.execute(sa.insert(Exercise), rows)
+            rows = []
+    if rows:
+        db.session.execute(sa.insert(Exercise), rows)
+
+    ids = [w['id'] for w in workouts]
+    last_done = Workout.last_done_by_workout(ids)
+    db.session.execute(sa.update(Workout), [{'id': wid, 'last_done': last_done.get(wid)} for wid in ids])
+    DailyActivity.rebuild(user.id)
+    WeeklyActivity.rebuild(user.id)
+    db.session.commit()
+    return user
+
+
+def generate(users=3, years=3, sessions_per_week=4, seed=1):
+    # The same seed always produces the same rows, so benchmark runs are comparable
+    rng = random.Random(seed)
+    return [generate_user(rng, f'athlete{i}', years, sessions_per_week) for i in range(users)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--sessions-per-week', type=float, default=4)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    make_app()
+    users = generate(args.users, args.years, args.sessions_per_week, args.seed)
+    sets = db.session.scalar(sa.select(sa.func.count(Exercise.id)))
+    workouts = db.session.scalar(sa.select(sa.func.count(Workout.id)))
+    print(f'{len(users)} users, {workouts} workouts, {sets} sets')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# Drives every route in app/main and app/auth through the test client against generated data,
+# reporting latency percentiles, queries per request and peak memory, and fails on regressions
+# against a stored baseline.
+# Run with: python -m benchmarks.suite [--scale medium] [--update-baseline]
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from benchmarks.common import BenchConfig, login, count_queries
+from benchmarks.generator import SCALES, generate
+import sqlalchemy as sa
+from app import create_app, db
+from app.models import User, Workout, Exercise, DailyActivity, WeeklyActivity
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+PASSWORD = 'bench-password'
+MIN_TIMED_ITERATIONS = 30
+
+
+class SuiteConfig(BenchConfig):
+    # Routes are measured without the page cache so regressions in the views show up;
+    # a cheap hash keeps login and register from timing only the KDF
+    CACHE_TYPE = 'none'
+    PASSWORD_HASH_WORKERS = 0
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+
+
+def new_workout(state):
+    workout = Workout(user_id=state['user_id'], name='Scratch', exercise_type='machine', muscle_group='abs')
+    db.session.add(workout)
+    db.session.commit()
+    return workout.id
+
+
+def new_exercise(state):
+    exercise = Exercise(workout_id=state['workout_id'], user_id=state['user_id'], weight=100, count=5)
+    db.session.add(exercise)
+    db.session.commit()
+    return exercise.id
+
+
+def delete_account(state):
+    # A throwaway user with a little history to delete; the request logs in as it
+    username = f'doomed{next(state["counter"])}'
+    user = User(username=username, email=f'{username}@example.com')
+    workout = Workout(user=user, name='Row', exercise_type='machine', muscle_group='back')
+    db.session.add(workout)
+    db.session.flush()
+    db.session.execute(sa.insert(Exercise), [
+        {'workout_id': workout.id, 'user_id': user.id, 'weight': 100, 'count': 5} for _ in range(20)])
+    DailyActivity.rebuild(user.id)
+    WeeklyActivity.rebuild(user.id)
+    db.session.commit()
+    state['login_as'] = SimpleNamespace(id=user.id)
+    return 'post', '/delete_account', {}
+
+
+def reset_token(state):
+    return db.session.get(User, state['user_id']).get_reset_password_token()
+
+
+def registration(state):
+    username = f'new{next(state["counter"])}'
+    return {'username': username, 'email': f'{username}@example.com',
+            'password': PASSWORD, 'password2': PASSWORD}
+
+
+def import_body():
+    lines = ['date,workout,exercise_type,muscle_group,weight,count,distance']
+    lines += [f'2024-06-{day:02d},Imported Row,machine,back,{100 + day},8,' for day in range(1, 29)]
+    return '\n'.join(lines) + '\n'
+
+
+# (name, logged in, expected status, prepare(state) -> (method, url, request kwargs));
+# prepare runs untimed, so it can create the rows a destructive route consumes
+ROUTES = [
+    ('GET /auth/login', False, 200, lambda s: ('get', '/auth/login', {})),
+    ('POST /auth/login', False, 302, lambda s: ('post', '/auth/login', {
+        'data': {'username': s['username'], 'password': PASSWORD}})),
+    ('GET /auth/logout', True, 302, lambda s: ('get', '/auth/logout', {})),
+    ('GET /auth/register', False, 200, lambda s: ('get', '/auth/register', {})),
+    ('POST /auth/register', False, 302, lambda s: ('post', '/auth/register', {'data': registration(s)})),
+    ('GET /auth/reset_password_request', False, 200, lambda s: ('get', '/auth/reset_password_request', {})),
+    ('POST /auth/reset_password_request', False, 302, lambda s: ('post', '/auth/reset_password_request', {
+        'data': {'email': f'{s["username"]}@example.com'}})),
+    ('GET /auth/reset_password/<token>', False, 200, lambda s: (
+        'get', f'/auth/reset_password/{reset_token(s)}', {})),
+    ('POST /auth/reset_password/<token>', False, 302, lambda s: (
+        'post', f'/auth/reset_password/{reset_token(s)}', {'data': {'password': PASSWORD, 'password2': PASSWORD}})),
+    ('GET /', True, 200, lambda s: ('get', '/', {})),
+    ('GET /user/<username>', True, 200, lambda s: ('get', f'/user/{s["username"]}', {})),
+    ('GET /edit_profile', True, 200, lambda s: ('get', '/edit_profile', {})),
+    ('POST /edit_profile', True, 302, lambda s: ('post', '/edit_profile', {
+        'data': {'username': s['username'], 'about_me': 'Training'}})),
+    ('POST /delete_account', True, 302, delete_account),
+    ('GET /workouts', True, 200, lambda s: ('get', '/workouts', {})),
+    ('GET /create-workout', True, 200, lambda s: ('get', '/create-workout', {})),
+    ('POST /create-workout', True, 302, lambda s: ('post', '/create-workout', {
+        'data': {'name': 'Bench', 'exercise_type': 'machine', 'muscle_group': 'chest'}})),
+    ('GET /workouts/<id>', True, 200, lambda s: ('get', f'/workouts/{s["workout_id"]}', {})),
+    ('POST /workouts/<id>', True, 302, lambda s: ('post', f'/workouts/{s["workout_id"]}', {
+        'data': {'name': 'Renamed', 'exercise_type': 'free_weight', 'muscle_group': 'back'}})),
+    ('POST /workouts/<id>/delete', True, 302, lambda s: ('post', f'/workouts/{new_workout(s)}/delete', {})),
+    ('GET /api/workouts', True, 200, lambda s: ('get', '/api/workouts', {})),
+    ('GET /api/workouts?metric=volume', True, 200, lambda s: ('get', '/api/workouts?metric=volume', {})),
+    ('GET /api/workouts/list', True, 200, lambda s: ('get', '/api/workouts/list', {})),
+    ('GET /api/workouts/list?q=', True, 200, lambda s: (
+        'get', '/api/workouts/list?q=bench&muscle_group=chest&stale=stale', {})),
+    ('GET /api/dashboard', True, 200, lambda s: ('get', '/api/dashboard?weeks=52', {})),
+    ('GET /api/sync', True, 200, lambda s: ('get', '/api/sync', {})),
+    ('POST /api/workouts/<id>/exercises', True, 201, lambda s: (
+        'post', f'/api/workouts/{s["workout_id"]}/exercises', {'json': [
+            {'date': '2024-12-01', 'weight': 100 + i, 'count': 5} for i in range(20)]})),
+    ('GET /api/workouts/<id>/exercises', True, 200, lambda s: (
+        'get', f'/api/workouts/{s["workout_id"]}/exercises', {})),
+    ('GET /api/workouts/<id>/progress', True, 200, lambda s: (
+        'get', f'/api/workouts/{s["workout_id"]}/progress', {})),
+    ('GET /export', True, 200, lambda s: ('get', '/export?format=csv', {})),
+    ('POST /import', True, 200, lambda s: ('post', '/import?format=csv', {
+        'data': import_body(), 'content_type': 'text/csv'})),
+    ('GET /log-exercise/<id>', True, 200, lambda s: ('get', f'/log-exercise/{s["workout_id"]}', {})),
+    ('GET /log-exercise/<id>/history', True, 200, lambda s: (
+        'get', f'/log-exercise/{s["history_workout_id"]}/history', {})),
+    ('POST /log-exercise/<id>', True, 302, lambda s: ('post', f'/log-exercise/{s["workout_id"]}', {
+        'data': {'date': '2024-12-02', 'weight': 105, 'count': 5}})),
+    ('GET /edit-exercise/<id>/<id>', True, 200, lambda s: (
+        'get', f'/edit-exercise/{s["workout_id"]}/{s["exercise_id"]}', {})),
+    ('POST /edit-exercise/<id>/<id>', True, 302, lambda s: (
+        'post', f'/edit-exercise/{s["workout_id"]}/{s["exercise_id"]}', {
+            'data': {'date': '2024-12-03', 'weight': 110, 'count': 6}})),
+    ('GET /delete-exercise/<id>/<id>', True, 302, lambda s: (
+        'get', f'/delete-exercise/{s["workout_id"]}/{new_exercise(s)}', {})),
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def measure(app, state, name, logged_in, expected, prepare, iterations):
+    def request():
+        with app.app_context():
+            method, url, kwargs = prepare(state)
+        # A new client per request, so a login or logout never leaks into the next one
+        client = app.test_client()
+        if logged_in:
+            login(client, state.pop('login_as', state['user']))
+        start = time.perf_counter()
+        response = getattr(client, method)(url, **kwargs)
+        response.get_data()
+        elapsed = time.perf_counter() - start
+        if response.status_code != expected:
+            raise AssertionError(f'{name}: expected {expected}, got {response.status_code}')
+        return elapsed
+
+    request()
+    timings = [request() for _ in range(iterations)]
+
+    # Queries and memory come from separate runs so tracing does not skew the timings
+    statements = []
+    with count_queries(state['engine'], statements):
+        request()
+    tracemalloc.start()
+    request()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'p50_ms': percentile(timings, 0.5) * 1000, 'p95_ms': percentile(timings, 0.95) * 1000,
+            'p99_ms': percentile(timings, 0.99) * 1000, 'queries': len(statements),
+            'peak_kib': peak / 1024}
+
+
+def compare(results, baseline, tolerance, gate_timings=True):
+    # Query counts are deterministic and must not grow; timings and memory get slack for noise,
+    # and latency is gated on the median since tail percentiles of a few dozen runs are too noisy
+    failures = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            failures.append(f"{name}: {result['queries']} queries (baseline {base['queries']})")
+        if gate_timings and result['p50_ms'] > base['p50_ms'] * (1 + tolerance) + 1:
+            failures.append(f"{name}: p50 {result['p50_ms']:.1f} ms (baseline {base['p50_ms']:.1f} ms)")
+        if result['peak_kib'] > base['peak_kib'] * (1 + tolerance) + 64:
+            failures.append(f"{name}: peak {result['peak_kib']:.0f} KiB (baseline {base['peak_kib']:.0f} KiB)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--only', help='run routes whose name contains this text')
+    args = parser.parse_args()
+
+    app = create_app(SuiteConfig)
+    with app.app_context():
+        db.create_all()
+        user = generate(seed=1, **SCALES[args.scale])[0]
+        user.set_password(PASSWORD)
+        db.session.commit()
+        workout_id = db.session.scalar(sa.select(Workout.id).where(
+            Workout.user_id == user.id, Workout.exercise_type == 'machine').order_by(Workout.id))
+        # The full history is read from a workout no write route touches, so its size (and the
+        # peak memory of reading it) is the same in full and --only runs
+        history_workout_id = db.session.scalar(sa.select(Workout.id).where(
+            Workout.user_id == user.id, Workout.id != workout_id).order_by(Workout.id))
+        state = {'engine': db.engine, 'user': SimpleNamespace(id=user.id), 'user_id': user.id, 'username': user.username,
+                 'workout_id': workout_id, 'history_workout_id': history_workout_id, 'counter': itertools.count()}
+        state['exercise_id'] = new_exercise(state)
+
+    results = {}
+    for name, logged_in, expected, prepare in ROUTES:
+        if args.only and args.only not in name:
+            continue
+        results[name] = result = measure(app, state, name, logged_in, expected, prepare, args.iterations)
+        print(f"{name:40} p50 {result['p50_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f} ms  "
+              f"p99 {result['p99_ms']:7.2f} ms  {result['queries']:3d} queries  "
+              f"peak {result['peak_kib']:8.0f} KiB")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'scale': args.scale, 'routes': results}, f, indent=2, sort_keys=True)
+        print(f'Baseline written to {args.baseline}')
+        return
+
+    if not os.path.exists(args.baseline):
+        print('No baseline; run with --update-baseline to record one')
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['scale'] != args.scale:
+        sys.exit(f"Baseline was recorded at scale {baseline['scale']}, not {args.scale}")
+    # The median of a handful of runs moves with host noise alone, so short runs only gate
+    # query counts and memory
+    gate_timings = args.iterations >= MIN_TIMED_ITERATIONS
+    if not gate_timings:
+        print(f'Latency not gated below {MIN_TIMED_ITERATIONS} iterations')
+    failures = compare(results, baseline['routes'], args.tolerance, gate_timings)
+    for failure in failures:
+        print(f'REGRESSION {failure}')
+    if failures:
+        sys.exit(1)
+    print('No regressions against the baseline')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,16 @@
 #!/bin/bash
 # this script is used to boot a Docker container
-while true; do
-    flask db upgrade
-    if [[ "$?" == "0" ]]; then
-        break
-    fi
-    echo Deploy command failed, retrying in 5 secs...
-    sleep 5
-done
-exec gunicorn -b :8080 --access-logfile - --error-logfile - fitness-tracker:app
\ No newline at end of file
+# skip the upgrade (and its full app import) when the schema is already at head
+if python check_db_head.py; then
+    echo Database schema is up to date
+else
+    while true; do
+        flask db upgrade
+        if [[ "$?" == "0" ]]; then
+            break
+        fi
+        echo Deploy command failed, retrying in 5 secs...
+        sleep 5
+    done
+fi
+exec gunicorn -b :8080 --access-logfile - --error-logfile - fitness-tracker:app
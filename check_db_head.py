@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# Exits 0 when the database is already at the newest migration, so boot.sh can skip
+# `flask db upgrade` (which imports the app and Alembic) on routine restarts.
+# Any doubt (no database, no version table, unreadable scripts) exits 1 and the upgrade runs.
+import glob
+import os
+import re
+import sys
+import sqlalchemy as sa
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+REVISION = re.compile(r"^revision\s*=\s*['\"](\w+)['\"]", re.M)
+DOWN_REVISION = re.compile(r"^down_revision\s*=\s*(.+)$", re.M)
+
+
+def script_heads(directory):
+    revisions, parents = set(), set()
+    for path in glob.glob(os.path.join(directory, '*.py')):
+        with open(path) as f:
+            source = f.read()
+        revision = REVISION.search(source)
+        if revision is None:
+            continue
+        revisions.add(revision.group(1))
+        down = DOWN_REVISION.search(source)
+        if down:
+            # Covers a single id, None, and the tuple of ids a merge revision has
+            parents.update(re.findall(r"['\"](\w+)['\"]", down.group(1)))
+    return revisions - parents
+
+
+def database_url(url):
+    # Flask-SQLAlchemy resolves relative SQLite paths against the instance folder
+    url = sa.engine.make_url(url)
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:' \
+            and not os.path.isabs(url.database):
+        url = url.set(database=os.path.join(basedir, 'instance', url.database))
+    return url
+
+
+def main():
+    if not os.environ.get('DATABASE_URL'):
+        return 1
+    heads = script_heads(os.path.join(basedir, 'migrations', 'versions'))
+    if not heads:
+        return 1
+    engine = sa.create_engine(database_url(os.environ['DATABASE_URL']), poolclass=sa.pool.NullPool)
+    try:
+        with engine.connect() as connection:
+            current = set(connection.scalars(sa.text('SELECT version_num FROM alembic_version')))
+    except sa.exc.SQLAlchemyError:
+        return 1
+    return 0 if current == heads else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,10 +4,58 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    # Unset pool settings fall back to per-driver defaults in app/pool.py
+    DB_POOL_SIZE = os.environ.get('DB_POOL_SIZE')
+    DB_MAX_OVERFLOW = os.environ.get('DB_MAX_OVERFLOW')
+    DB_POOL_TIMEOUT = os.environ.get('DB_POOL_TIMEOUT')
+    DB_POOL_RECYCLE = os.environ.get('DB_POOL_RECYCLE')
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING')
+    DB_STATEMENT_TIMEOUT = os.environ.get('DB_STATEMENT_TIMEOUT')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # orjson or stdlib; unset picks orjson when it is installed
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER')
+    # Responses smaller than this go out uncompressed; brotli is used when installed and accepted
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 1024)
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL') or 6)
+    COMPRESS_BR_LEVEL = int(os.environ.get('COMPRESS_BR_LEVEL') or 4)
+    # Compiled templates persist here across restarts; the Docker image ships it pre-warmed
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR')
+    # Shared directory for per-worker metric snapshots, e.g. a tmpfs under gunicorn
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_WRITE_INTERVAL = int(os.environ.get('METRICS_WRITE_INTERVAL') or 10)
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS') or 200)
     WORKOUTS_PER_PAGE = 5
+    MAX_SETS_PER_REQUEST = 1000
+    IMPORT_BATCH_SIZE = 1000
+    DASHBOARD_WEEKS = 12
+    MAX_DASHBOARD_WEEKS = 520
+    SYNC_BATCH_SIZE = 500
+    SYNC_TOMBSTONE_DAYS = int(os.environ.get('SYNC_TOMBSTONE_DAYS') or 90)
+    # How far behind its cursor a new sync looks again for rows committed late
+    SYNC_OVERLAP_SECONDS = int(os.environ.get('SYNC_OVERLAP_SECONDS') or 60)
+    PROGRESS_CACHE_SIZE = 256
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE') or 1024)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 60)
+    CACHE_TYPE = os.environ.get('CACHE_TYPE') or 'lru'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+    CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT') or 300)
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 1024)
+    CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES') or 64 * 2**20)
+    LAST_SEEN_RESOLUTION = int(os.environ.get('LAST_SEEN_RESOLUTION') or 60)
+    LAST_SEEN_FLUSH_INTERVAL = int(os.environ.get('LAST_SEEN_FLUSH_INTERVAL') or 30)
+    LAST_SEEN_FLUSH_COUNT = int(os.environ.get('LAST_SEEN_FLUSH_COUNT') or 100)
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 25)
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS') is not None
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
-    ADMINS = ['dmsoftwarestore@gmail.com']
\ No newline at end of file
+    MAIL_QUEUE_SIZE = int(os.environ.get('MAIL_QUEUE_SIZE') or 500)
+    MAIL_WORKERS = int(os.environ.get('MAIL_WORKERS') or 2)
+    MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE') or 50)
+    MAIL_MAX_RETRIES = int(os.environ.get('MAIL_MAX_RETRIES') or 3)
+    MAIL_RETRY_BACKOFF = float(os.environ.get('MAIL_RETRY_BACKOFF') or 1.0)
+    ADMINS = ['dmsoftwarestore@gmail.com']
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE') or 8)
+    PASSWORD_HASH_TIMEOUT = int(os.environ.get('PASSWORD_HASH_TIMEOUT') or 10)
\ No newline at end of file
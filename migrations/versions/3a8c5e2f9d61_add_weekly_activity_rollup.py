@@ -0,0 +1,49 @@
+"""add weekly_activity rollup
+
+Revision ID: 3a8c5e2f9d61
+Revises: b6e1d4a9c372
+Create Date: 2026-10-18 19:32:48.117604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a8c5e2f9d61'
+down_revision = 'b6e1d4a9c372'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('weekly_activity',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('week', sa.Date(), nullable=False),
+    sa.Column('muscle_group', sa.String(length=64), nullable=False),
+    sa.Column('exercise_type', sa.String(length=64), nullable=False),
+    sa.Column('set_count', sa.Integer(), nullable=False),
+    sa.Column('volume', sa.Integer(), nullable=False),
+    sa.Column('distance', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'week', 'muscle_group', 'exercise_type')
+    )
+
+    # Seed the rollup from existing history; weeks start on Monday
+    if op.get_bind().dialect.name == 'postgresql':
+        week = "date_trunc('week', exercise.date)::date"
+    else:
+        week = "date(exercise.date, 'weekday 0', '-6 days')"
+    op.execute(
+        'INSERT INTO weekly_activity (user_id, week, muscle_group, exercise_type, set_count, volume, distance) '
+        f'SELECT exercise.user_id, {week}, workout.muscle_group, workout.exercise_type, count(*), '
+        'sum(coalesce(exercise.weight, 0) * coalesce(exercise.count, 0)), '
+        'sum(coalesce(exercise.distance, 0)) '
+        'FROM exercise '
+        'JOIN workout ON workout.id = exercise.workout_id '
+        f'GROUP BY exercise.user_id, {week}, workout.muscle_group, workout.exercise_type'
+    )
+
+
+def downgrade():
+    op.drop_table('weekly_activity')
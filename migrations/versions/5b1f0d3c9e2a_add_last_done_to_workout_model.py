@@ -0,0 +1,34 @@
+"""add last_done to Workout model
+
+Revision ID: 5b1f0d3c9e2a
+Revises: 2432b791d09a
+Create Date: 2026-10-18 09:12:41.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1f0d3c9e2a'
+down_revision = '2432b791d09a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('workout', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_done', sa.DateTime(), nullable=True))
+
+    # Backfill from existing history with a single grouped statement
+    op.execute(
+        'UPDATE workout SET last_done = ('
+        'SELECT max(exercise.date) FROM exercise '
+        'JOIN workout_exercise ON workout_exercise.exercise_id = exercise.id '
+        'WHERE workout_exercise.workout_id = workout.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('workout', schema=None) as batch_op:
+        batch_op.drop_column('last_done')
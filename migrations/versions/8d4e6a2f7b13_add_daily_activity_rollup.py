@@ -0,0 +1,44 @@
+"""add daily_activity rollup
+
+Revision ID: 8d4e6a2f7b13
+Revises: 5b1f0d3c9e2a
+Create Date: 2026-10-18 10:03:27.551902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4e6a2f7b13'
+down_revision = '5b1f0d3c9e2a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_activity',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('set_count', sa.Integer(), nullable=False),
+    sa.Column('volume', sa.Integer(), nullable=False),
+    sa.Column('distance', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+
+    # Seed the rollup from existing history
+    op.execute(
+        'INSERT INTO daily_activity (user_id, day, set_count, volume, distance) '
+        'SELECT workout.user_id, date(exercise.date), count(*), '
+        'sum(coalesce(exercise.weight, 0) * coalesce(exercise.count, 0)), '
+        'sum(coalesce(exercise.distance, 0)) '
+        'FROM exercise '
+        'JOIN workout_exercise ON workout_exercise.exercise_id = exercise.id '
+        'JOIN workout ON workout.id = workout_exercise.workout_id '
+        'GROUP BY workout.user_id, date(exercise.date)'
+    )
+
+
+def downgrade():
+    op.drop_table('daily_activity')
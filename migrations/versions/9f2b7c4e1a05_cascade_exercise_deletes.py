@@ -0,0 +1,35 @@
+"""cascade exercise deletes from workout and user
+
+Revision ID: 9f2b7c4e1a05
+Revises: 3a8c5e2f9d61
+Create Date: 2026-10-18 20:14:37.562981
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f2b7c4e1a05'
+down_revision = '3a8c5e2f9d61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Orphaned sets are left for `flask compact-orphans`, which deletes them in throttled batches
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_exercise_workout_id_workout', type_='foreignkey')
+        batch_op.drop_constraint('fk_exercise_user_id_user', type_='foreignkey')
+        batch_op.create_foreign_key('fk_exercise_workout_id_workout', 'workout', ['workout_id'], ['id'],
+                                    ondelete='CASCADE')
+        batch_op.create_foreign_key('fk_exercise_user_id_user', 'user', ['user_id'], ['id'],
+                                    ondelete='CASCADE')
+
+
+def downgrade():
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_exercise_user_id_user', type_='foreignkey')
+        batch_op.drop_constraint('fk_exercise_workout_id_workout', type_='foreignkey')
+        batch_op.create_foreign_key('fk_exercise_user_id_user', 'user', ['user_id'], ['id'])
+        batch_op.create_foreign_key('fk_exercise_workout_id_workout', 'workout', ['workout_id'], ['id'])
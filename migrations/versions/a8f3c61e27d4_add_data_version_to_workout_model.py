@@ -0,0 +1,25 @@
+"""add data_version to Workout model
+
+Revision ID: a8f3c61e27d4
+Revises: d4a7e3b58c20
+Create Date: 2026-10-18 23:42:17.305118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8f3c61e27d4'
+down_revision = 'd4a7e3b58c20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ALTERs: a batch rebuild of workout on SQLite would drop its full-text triggers
+    op.add_column('workout', sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    op.drop_column('workout', 'data_version')
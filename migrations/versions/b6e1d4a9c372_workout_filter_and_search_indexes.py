@@ -0,0 +1,58 @@
+"""workout filter and name search indexes
+
+Revision ID: b6e1d4a9c372
+Revises: f31c7d9a8e54
+Create Date: 2026-10-18 17:41:05.309127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e1d4a9c372'
+down_revision = 'f31c7d9a8e54'
+branch_labels = None
+depends_on = None
+
+# Same statements app/models.py runs on create_all; kept here so the migration does not change with the model
+WORKOUT_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS workout_fts USING fts5(name, content='workout', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS workout_fts_insert AFTER INSERT ON workout BEGIN "
+    "INSERT INTO workout_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS workout_fts_delete AFTER DELETE ON workout BEGIN "
+    "INSERT INTO workout_fts(workout_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS workout_fts_update AFTER UPDATE OF name ON workout BEGIN "
+    "INSERT INTO workout_fts(workout_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO workout_fts(rowid, name) VALUES (new.id, new.name); END",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    with op.get_context().autocommit_block():
+        op.create_index('ix_workout_user_id_muscle_group_name', 'workout', ['user_id', 'muscle_group', 'name'],
+                        unique=False, postgresql_concurrently=True)
+        if dialect == 'postgresql':
+            op.create_index('ix_workout_name_tsv', 'workout', [sa.text("to_tsvector('simple', name)")],
+                            unique=False, postgresql_using='gin', postgresql_concurrently=True)
+    # The composite index starts with user_id, so the single-column one is redundant
+    op.drop_index('ix_workout_user_id', table_name='workout')
+
+    if dialect == 'sqlite':
+        for statement in WORKOUT_FTS_DDL:
+            op.execute(statement)
+        # Index the names already in the table
+        op.execute("INSERT INTO workout_fts(workout_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in ('workout_fts_insert', 'workout_fts_delete', 'workout_fts_update'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS workout_fts')
+    if dialect == 'postgresql':
+        op.drop_index('ix_workout_name_tsv', table_name='workout')
+    op.create_index('ix_workout_user_id', 'workout', ['user_id'], unique=False)
+    op.drop_index('ix_workout_user_id_muscle_group_name', table_name='workout')
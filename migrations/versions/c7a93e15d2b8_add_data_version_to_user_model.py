@@ -0,0 +1,26 @@
+"""add data_version to User model
+
+Revision ID: c7a93e15d2b8
+Revises: 8d4e6a2f7b13
+Create Date: 2026-10-18 11:26:08.730115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a93e15d2b8'
+down_revision = '8d4e6a2f7b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
@@ -0,0 +1,53 @@
+"""updated_at on workout and exercise, and sync tombstones
+
+Revision ID: d4a7e3b58c20
+Revises: 9f2b7c4e1a05
+Create Date: 2026-10-18 21:06:52.480316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a7e3b58c20'
+down_revision = '9f2b7c4e1a05'
+branch_labels = None
+depends_on = None
+
+# Existing rows predate any sync cursor, so a constant default is enough; SQLite cannot add a
+# column whose default is CURRENT_TIMESTAMP
+EPOCH = sa.text("'1970-01-01 00:00:00'")
+
+
+def upgrade():
+    op.add_column('workout', sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=EPOCH))
+    op.add_column('exercise', sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=EPOCH))
+    op.create_table('tombstone',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=16), nullable=False),
+    sa.Column('object_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tombstone_user_id_deleted_at', 'tombstone', ['user_id', 'deleted_at', 'id'], unique=False)
+    op.create_index('ix_tombstone_deleted_at', 'tombstone', ['deleted_at'], unique=False)
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_workout_user_id_updated_at', 'workout', ['user_id', 'updated_at', 'id'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_exercise_user_id_updated_at', 'exercise', ['user_id', 'updated_at', 'id'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('ix_exercise_user_id_updated_at', table_name='exercise')
+    op.drop_index('ix_workout_user_id_updated_at', table_name='workout')
+    op.drop_index('ix_tombstone_deleted_at', table_name='tombstone')
+    op.drop_index('ix_tombstone_user_id_deleted_at', table_name='tombstone')
+    op.drop_table('tombstone')
+    # Plain ALTER TABLE DROP COLUMN: a batch rebuild of workout would drop the workout_fts triggers
+    op.drop_column('exercise', 'updated_at')
+    op.drop_column('workout', 'updated_at')
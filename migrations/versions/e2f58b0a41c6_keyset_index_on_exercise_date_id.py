@@ -0,0 +1,28 @@
+"""keyset index on exercise (date, id)
+
+Revision ID: e2f58b0a41c6
+Revises: c7a93e15d2b8
+Create Date: 2026-10-18 13:48:55.019384
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f58b0a41c6'
+down_revision = 'c7a93e15d2b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.create_index('ix_exercise_date_id', ['date', 'id'], unique=False)
+        batch_op.drop_index('ix_exercise_date')
+
+
+def downgrade():
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.create_index('ix_exercise_date', ['date'], unique=False)
+        batch_op.drop_index('ix_exercise_date_id')
@@ -0,0 +1,78 @@
+"""direct workout and user keys on Exercise
+
+Revision ID: f31c7d9a8e54
+Revises: e2f58b0a41c6
+Create Date: 2026-10-18 15:02:11.846230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f31c7d9a8e54'
+down_revision = 'e2f58b0a41c6'
+branch_labels = None
+depends_on = None
+
+# Rows updated per statement while backfilling, so no single transaction holds locks on the whole table
+BATCH_SIZE = 5000
+
+
+def upgrade():
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('workout_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_exercise_workout_id_workout', 'workout', ['workout_id'], ['id'])
+        batch_op.create_foreign_key('fk_exercise_user_id_user', 'user', ['user_id'], ['id'])
+
+    bind = op.get_bind()
+    max_id = bind.scalar(sa.text('SELECT max(id) FROM exercise')) or 0
+
+    # Each chunk commits on its own; a set linked to several workouts keeps the lowest workout id
+    with op.get_context().autocommit_block():
+        # The primary key leads with workout_id, so without this every chunk's lookups by
+        # exercise_id scan the whole association table. It goes away with the table below
+        op.create_index('ix_workout_exercise_exercise_id', 'workout_exercise', ['exercise_id', 'workout_id'],
+                        unique=False, postgresql_concurrently=True)
+        for low in range(0, max_id, BATCH_SIZE):
+            bind.execute(sa.text(
+                'UPDATE exercise SET '
+                'workout_id = (SELECT min(workout_exercise.workout_id) FROM workout_exercise '
+                'WHERE workout_exercise.exercise_id = exercise.id), '
+                'user_id = (SELECT workout.user_id FROM workout WHERE workout.id = '
+                '(SELECT min(workout_exercise.workout_id) FROM workout_exercise '
+                'WHERE workout_exercise.exercise_id = exercise.id)) '
+                'WHERE exercise.id > :low AND exercise.id <= :high'
+            ), {'low': low, 'high': low + BATCH_SIZE})
+
+        op.create_index('ix_exercise_workout_id_date', 'exercise', ['workout_id', 'date', 'id'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_exercise_user_id_date', 'exercise', ['user_id', 'date', 'id'],
+                        unique=False, postgresql_concurrently=True)
+
+    op.drop_index('ix_exercise_date_id', table_name='exercise')
+    op.drop_table('workout_exercise')
+
+
+def downgrade():
+    op.create_table('workout_exercise',
+    sa.Column('workout_id', sa.Integer(), nullable=False),
+    sa.Column('exercise_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['exercise_id'], ['exercise.id'], ),
+    sa.ForeignKeyConstraint(['workout_id'], ['workout.id'], ),
+    sa.PrimaryKeyConstraint('workout_id', 'exercise_id')
+    )
+    op.execute(
+        'INSERT INTO workout_exercise (workout_id, exercise_id) '
+        'SELECT workout_id, id FROM exercise WHERE workout_id IS NOT NULL'
+    )
+    op.create_index('ix_exercise_date_id', 'exercise', ['date', 'id'], unique=False)
+    op.drop_index('ix_exercise_user_id_date', table_name='exercise')
+    op.drop_index('ix_exercise_workout_id_date', table_name='exercise')
+
+    with op.batch_alter_table('exercise', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_exercise_user_id_user', type_='foreignkey')
+        batch_op.drop_constraint('fk_exercise_workout_id_workout', type_='foreignkey')
+        batch_op.drop_column('user_id')
+        batch_op.drop_column('workout_id')
@@ -1,15 +1,35 @@
 #!/usr/bin/env python
-from datetime import datetime
+from datetime import date, datetime, timedelta
+import gzip
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import time
 import unittest
+from flask import g
+import sqlalchemy as sa
 from sqlalchemy.exc import IntegrityError
-from app import create_app, db
-from app.models import User, Workout, Exercise
+from app import create_app, db, last_seen, mail_queue, passwords, transfer
+from app.models import User, Workout, Exercise, DailyActivity, WeeklyActivity, week_of
+from app.caching import LRUCache, SharedCache
+from app.compression import precompress
+from app.email import send_email
+from app.heatmap import activity_heatmap
+from app.json_provider import JSONProvider, OrjsonProvider
+from app.passwords import HashingPoolBusy
+from app.main.routes import workout_list_query
+from app.pool import engine_options, pool_stats
 from config import Config
 
 
 class TestConfig(Config):
     TESTING = True
+    WTF_CSRF_ENABLED = False
+    SECRET_KEY = 'test'
     SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    PASSWORD_HASH_WORKERS = 0
 
 class UserModelCase(unittest.TestCase):
     def setUp(self):
@@ -88,7 +108,902 @@ class WorkoutModelCase(unittest.TestCase):
         self.assertEqual(w2.exercise_type, "cardio")
         self.assertEqual(w2.exercises[0].date, date)
         self.assertEqual(w2.exercises[0].distance, 1)
+
+    def test_last_done_by_workout(self):
+        u = User(username='Derrick', email='derrick@example.com')
+        w1 = Workout(user=u, name="Bench Press", exercise_type="machine", muscle_group="chest")
+        w2 = Workout(user=u, name="Walk", exercise_type="cardio", muscle_group="heart")
+        db.session.add_all([w1, w2])
+        w1.exercises.append(Exercise(date=datetime(2025, 1, 1), count=1, weight=10))
+        w1.exercises.append(Exercise(date=datetime(2025, 2, 1), count=1, weight=10))
+        db.session.commit()
+
+        last_done = Workout.last_done_by_workout([w1.id, w2.id])
+        self.assertEqual(last_done, {w1.id: datetime(2025, 2, 1)})
+
+        w1.refresh_last_done()
+        self.assertEqual(w1.last_done, datetime(2025, 2, 1))
         
+class ActivityApiCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.user = User(username='Derrick', email='derrick@example.com')
+        self.workout = Workout(user=self.user, name="Bench Press", exercise_type="machine", muscle_group="chest")
+        db.session.add(self.workout)
+        db.session.commit()
+        self.client = self.app.test_client()
+        self.login(self.user)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def login(self, user):
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(user.id)
+        # Requests share the test's app context, so drop Flask-Login's cached user
+        g.pop('_login_user', None)
+
+    def log(self, day, weight, count):
+        return self.client.post(f'/log-exercise/{self.workout.id}', data={
+            'date': day, 'weight': weight, 'count': count})
+
+    def test_user_deleted_by_another_worker_is_logged_out(self):
+        self.assertEqual(self.client.get('/workouts').status_code, 200)
+        # Core deletes skip the invalidation hook, like a delete run in another worker
+        self.user.delete_account()
+        db.session.commit()
+        g.pop('_login_user', None)
+        response = self.client.get('/workouts')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/auth/login', response.headers['Location'])
+
+    def test_rollup_tracks_exercise_writes(self):
+        self.log('2025-03-01', 100, 5)
+        self.log('2025-03-01', 100, 3)
+        self.log('2025-03-02', 50, 10)
+        rollup = db.session.get(DailyActivity, (self.user.id, date(2025, 3, 1)))
+        self.assertEqual((rollup.set_count, rollup.volume), (2, 800))
+
+        exercise = db.session.scalar(sa.select(Exercise).where(Exercise.count == 3))
+        self.client.get(f'/delete-exercise/{self.workout.id}/{exercise.id}')
+        db.session.refresh(rollup)
+        self.assertEqual((rollup.set_count, rollup.volume), (1, 500))
+
+        DailyActivity.rebuild(self.user.id)
+        rollup = db.session.get(DailyActivity, (self.user.id, date(2025, 3, 1)))
+        self.assertEqual((rollup.set_count, rollup.volume), (1, 500))
+
+    def test_weekly_rollup_and_dashboard(self):
+        this_week = week_of(date.today())
+        last_week = this_week - timedelta(weeks=1)
+        self.log(this_week.isoformat(), 100, 5)
+        self.log(last_week.isoformat(), 100, 3)
+        self.log((last_week + timedelta(days=6)).isoformat(), 50, 10)
+        row = db.session.get(WeeklyActivity, (self.user.id, last_week, 'chest', 'machine'))
+        self.assertEqual((row.set_count, row.volume), (2, 800))
+
+        exercise = db.session.scalar(sa.select(Exercise).where(Exercise.count == 3))
+        self.client.get(f'/delete-exercise/{self.workout.id}/{exercise.id}')
+        self.client.post(f'/workouts/{self.workout.id}', data={
+            'name': 'Row', 'exercise_type': 'free_weight', 'muscle_group': 'back'})
+
+        dashboard = self.client.get('/api/dashboard?weeks=2').get_json()['weeks']
+        self.assertEqual(dashboard, [
+            {'week': last_week.isoformat(), 'set_count': 1, 'volume': 500, 'distance': 0, 'groups': [
+                {'muscle_group': 'back', 'exercise_type': 'free_weight', 'set_count': 1, 'volume': 500,
+                 'distance': 0}]},
+            {'week': this_week.isoformat(), 'set_count': 1, 'volume': 500, 'distance': 0, 'groups': [
+                {'muscle_group': 'back', 'exercise_type': 'free_weight', 'set_count': 1, 'volume': 500,
+                 'distance': 0}]}])
+        self.assertEqual(len(self.client.get('/api/dashboard?weeks=1').get_json()['weeks']), 1)
+        self.assertEqual(self.client.get('/api/dashboard?by=muscle_group').get_json()['weeks'][0]['groups'],
+                         [{'muscle_group': 'back', 'set_count': 1, 'volume': 500, 'distance': 0}])
+        self.assertEqual(self.client.get('/api/dashboard?weeks=0').status_code, 400)
+
+        # The incrementally maintained rollup matches one rebuilt from the history
+        def rollup():
+            return sorted((r.week, r.muscle_group, r.exercise_type, r.set_count, r.volume)
+                          for r in db.session.scalars(sa.select(WeeklyActivity)) if r.set_count)
+        maintained = rollup()
+        WeeklyActivity.rebuild(self.user.id)
+        self.assertEqual(rollup(), maintained)
+
+    def test_set_based_deletes(self):
+        self.log('2025-03-01', 100, 5)
+        self.log('2025-03-08', 100, 3)
+        statements = []
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        sa.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            self.client.post(f'/workouts/{self.workout.id}/delete')
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        # The sets are only read grouped for the rollups, and go through ON DELETE CASCADE
+        self.assertFalse([s for s in statements if s.startswith('SELECT exercise.id')])
+        self.assertEqual(db.session.scalar(sa.select(sa.func.count()).select_from(Exercise)), 0)
+        self.assertEqual(db.session.scalar(sa.select(sa.func.sum(DailyActivity.set_count))), 0)
+        self.assertEqual(db.session.scalar(sa.select(sa.func.sum(WeeklyActivity.set_count))), 0)
+
+        workout = Workout(user_id=self.user.id, name="Squat", exercise_type="machine", muscle_group="quadriceps")
+        db.session.add(workout)
+        db.session.commit()
+        self.client.post(f'/log-exercise/{workout.id}', data={'date': '2025-03-09', 'weight': 50, 'count': 5})
+        self.client.post('/delete_account')
+        db.session.remove()
+        for model in (User, Workout, Exercise, DailyActivity, WeeklyActivity):
+            self.assertEqual(db.session.scalar(sa.select(sa.func.count()).select_from(model)), 0)
+
+    def test_compact_orphans(self):
+        db.session.execute(sa.insert(Exercise), [{'date': datetime(2025, 1, 1), 'count': i, 'user_id': self.user.id}
+                                                 for i in range(7)])
+        self.log('2025-03-01', 100, 5)
+        runner = self.app.test_cli_runner()
+        self.assertIn('7 orphaned sets', runner.invoke(args=['compact-orphans', '--dry-run']).output)
+        result = runner.invoke(args=['compact-orphans', '--batch-size', '3', '--pause', '0'])
+        self.assertIn('Done, 7 orphaned sets deleted', result.output)
+        self.assertEqual(db.session.scalar(sa.select(sa.func.count()).select_from(Exercise)), 1)
+
+    def test_delta_sync(self):
+        # Exact deltas; the overlap window is covered by test_sync_rereads_late_commits
+        self.app.config['SYNC_OVERLAP_SECONDS'] = 0
+        url = f'/api/workouts/{self.workout.id}/exercises'
+        self.client.post(url, json=[{'date': f'2025-03-{day:02d}', 'weight': 100, 'count': 5} for day in range(1, 29)])
+
+        # A full sync arrives in resumable batches
+        first = self.client.get('/api/sync?limit=20').get_json()
+        self.assertEqual((len(first['workouts']), len(first['exercises']), first['more']), (1, 20, True))
+        second = self.client.get(f'/api/sync?limit=20&since={first["cursor"]}').get_json()
+        self.assertEqual((len(second['workouts']), len(second['exercises']), second['more']), (0, 8, False))
+        cursor = second['cursor']
+        self.assertEqual(self.client.get(f'/api/sync?since={cursor}').get_json()['exercises'], [])
+
+        # Only the changes come back: an edit, a delete, and the workout whose last_done moved
+        first_set, second_set = first['exercises'][0]['id'], first['exercises'][1]['id']
+        self.client.post(f'/edit-exercise/{self.workout.id}/{first_set}',
+                         data={'date': '2025-04-01', 'weight': 120, 'count': 5})
+        self.client.get(f'/delete-exercise/{self.workout.id}/{second_set}')
+        delta = self.client.get(f'/api/sync?since={cursor}').get_json()
+        self.assertEqual([(e['id'], e['weight']) for e in delta['exercises']], [(first_set, 120)])
+        self.assertEqual(delta['deleted'], [{'type': 'exercise', 'id': second_set}])
+        self.assertEqual([w['id'] for w in delta['workouts']], [self.workout.id])
+
+        self.client.post(f'/workouts/{self.workout.id}/delete')
+        delta = self.client.get(f'/api/sync?since={delta["cursor"]}').get_json()
+        self.assertEqual(delta['deleted'], [{'type': 'workout', 'id': self.workout.id}])
+        self.assertEqual(self.client.get('/api/sync?since=garbage').status_code, 400)
+
+    def test_sync_rereads_late_commits(self):
+        url = f'/api/workouts/{self.workout.id}/exercises'
+        self.client.post(url, json=[{'date': f'2025-03-{day:02d}', 'count': day} for day in range(1, 11)])
+        # Small pages of a sync inside the overlap window still move forward
+        cursor, seen = None, []
+        while True:
+            page = self.client.get('/api/sync?limit=3' + (f'&since={cursor}' if cursor else '')).get_json()
+            seen += [e['id'] for e in page['exercises']]
+            cursor = page['cursor']
+            if not page['more']:
+                break
+        self.assertEqual(len(seen), 10)
+
+        # A set stamped before the client's position but committed after it, as a slow
+        # concurrent transaction would leave it
+        position = max(e.updated_at for e in db.session.scalars(sa.select(Exercise)))
+        db.session.execute(sa.insert(Exercise), [{'workout_id': self.workout.id, 'user_id': self.user.id,
+                                                  'date': datetime(2025, 3, 20), 'count': 20,
+                                                  'updated_at': position - timedelta(seconds=5)}])
+        db.session.commit()
+        late = db.session.scalar(sa.select(sa.func.max(Exercise.id)))
+        # The window repeats all eleven recent sets, over pages that still end
+        resent, since = [], cursor
+        for _ in range(5):
+            page = self.client.get(f'/api/sync?limit=3&since={since}').get_json()
+            resent += [e['id'] for e in page['exercises']]
+            since = page['cursor']
+            if not page['more']:
+                break
+        self.assertFalse(page['more'])
+        self.assertIn(late, resent)
+        self.assertEqual(len(set(resent)), 11)
+
+        self.app.config['SYNC_OVERLAP_SECONDS'] = 0
+        self.assertEqual(self.client.get(f'/api/sync?since={cursor}').get_json()['exercises'], [])
+
+    def test_sync_payload_scales_with_changes(self):
+        self.app.config['SYNC_OVERLAP_SECONDS'] = 0
+        def delta_size(history):
+            workout = Workout(user_id=self.user.id, name=f'History {history}', exercise_type='machine',
+                              muscle_group='back')
+            db.session.add(workout)
+            db.session.commit()
+            url = f'/api/workouts/{workout.id}/exercises'
+            for start in range(0, history, 1000):
+                self.client.post(url, json=[{'date': '2025-03-01', 'weight': 100, 'count': 5}
+                                            for _ in range(min(1000, history - start))])
+            cursor = None
+            while True:
+                response = self.client.get('/api/sync' + (f'?since={cursor}' if cursor else ''))
+                cursor = response.get_json()['cursor']
+                if not response.get_json()['more']:
+                    break
+            self.client.post(url, json=[{'date': '2025-03-02', 'weight': 105, 'count': 5}])
+            delta = self.client.get(f'/api/sync?since={cursor}')
+            self.assertEqual(len(delta.get_json()['exercises']), 1)
+            return len(delta.get_data())
+
+        small, large = delta_size(10), delta_size(3000)
+        self.assertLess(abs(large - small), 20)
+
+    def test_heatmap_rendered_and_cached(self):
+        year = date.today().year
+        self.log(f'{year}-03-01', 100, 5)
+        self.log(f'{year}-03-01', 100, 3)
+        page = self.client.get('/').get_data(as_text=True)
+        self.assertIn('<svg', page)
+        self.assertIn(f'<title>{year}-03-01: 2 sets</title>', page)
+        self.assertNotIn('gstatic', page)
+
+        user = db.session.get(User, self.user.id)
+        statements = []
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        sa.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            svg = activity_heatmap(user.id, user.data_version, year)
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        self.assertEqual(statements, [])
+        self.assertEqual(svg.count('<rect'), (date(year, 12, 31) - date(year, 1, 1)).days + 1)
+
+        self.log(f'{year}-03-02', 100, 5)
+        self.assertIn(f'{year}-03-02: 1 sets', self.client.get('/').get_data(as_text=True))
+        self.assertNotIn('sets</title>', self.client.get(f'/?year={year - 1}').get_data(as_text=True))
+
+    def test_activity_api_range_and_intensity(self):
+        self.log('2025-03-01', 100, 5)
+        self.log('2025-03-01', 100, 3)
+        self.log('2025-03-05', 50, 10)
+        self.assertEqual(self.client.get('/api/workouts').get_json(),
+                         [['2025-03-01', 2], ['2025-03-05', 1]])
+        self.assertEqual(self.client.get('/api/workouts?from=2025-03-02&metric=volume').get_json(),
+                         [['2025-03-05', 500]])
+        self.assertEqual(self.client.get('/api/workouts?to=nope').status_code, 400)
+
+    def test_activity_api_not_modified(self):
+        self.log('2025-03-01', 100, 5)
+        response = self.client.get('/api/workouts')
+        etag = response.headers['ETag']
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+
+        statements = []
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        sa.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = self.client.get('/api/workouts', headers={'If-None-Match': etag})
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([s for s in statements if 'exercise' in s or 'daily_activity' in s])
+
+        self.log('2025-03-02', 100, 5)
+        response = self.client.get('/api/workouts', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_bulk_log_exercises(self):
+        url = f'/api/workouts/{self.workout.id}/exercises'
+        response = self.client.post(url, json={'sets': [
+            {'date': '2025-03-01', 'weight': 100, 'count': 5},
+            {'date': '2025-03-01', 'weight': 100, 'count': 3},
+            {'date': '2025-03-04T18:30:00', 'weight': 105, 'count': 2},
+        ]})
+        self.assertEqual(response.status_code, 201)
+        ids = response.get_json()['ids']
+        self.assertEqual(len(ids), 3)
+        self.assertEqual([e.id for e in self.workout.exercises], ids)
+        self.assertEqual(self.workout.last_done, datetime(2025, 3, 4, 18, 30))
+        rollup = db.session.get(DailyActivity, (self.user.id, date(2025, 3, 1)))
+        self.assertEqual((rollup.set_count, rollup.volume), (2, 800))
+
+        response = self.client.post(url, json=[{'date': '2025-03-05', 'weight': 1}, {'date': 'x'},
+                                               {'date': '2025-03-05', 'count': '5'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.get_json()['details']), ['1', '2'])
+        self.assertEqual(len(self.workout.exercises), 3)
+
+        # Offset dates are stored as naive UTC, so later batches still compare with last_done
+        response = self.client.post(url, json=[{'date': '2025-03-05T10:00:00+02:00', 'weight': 1}])
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(url, json=[{'date': '2025-03-05T09:00:00+00:00', 'weight': 1},
+                                               {'date': '2025-03-05T08:30:00', 'weight': 1}])
+        self.assertEqual(response.status_code, 201)
+        db.session.refresh(self.workout)
+        self.assertEqual(self.workout.last_done, datetime(2025, 3, 5, 9))
+
+        for size in (20, 200):
+            statements = []
+            def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+            sa.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+            try:
+                response = self.client.post(url, json=[{'date': '2025-04-01', 'weight': 10, 'count': i}
+                                                       for i in range(size)])
+            finally:
+                sa.event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+            self.assertEqual(len(response.get_json()['ids']), size)
+            self.assertEqual(len([s for s in statements if s.startswith('INSERT INTO exercise')]), 1)
+            # The insert, the id read-back, two rollup upserts, the version bump and at most
+            # the user, workout and last_done statements, whatever the number of sets
+            self.assertLessEqual(len(statements), 8)
+        ids = response.get_json()['ids']
+        self.assertEqual([e.count for e in db.session.scalars(
+            sa.select(Exercise).where(Exercise.id.in_(ids)).order_by(Exercise.id))], list(range(200)))
+
+    def test_export_import_round_trip(self):
+        self.log('2025-03-01', 100, 5)
+        self.log('2025-03-02', 50, 10)
+        db.session.add(Workout(user=self.user, name="Walk", exercise_type="cardio", muscle_group="heart"))
+        db.session.commit()
+
+        for fmt in ('csv', 'jsonl'):
+            exported = self.client.get(f'/export?format={fmt}').get_data()
+            other = User(username=f'other-{fmt}', email=f'other-{fmt}@example.com')
+            db.session.add(other)
+            db.session.commit()
+            self.login(other)
+            response = self.client.post(f'/import?format={fmt}', data=exported, content_type=transfer.MIMETYPES[fmt])
+            self.assertEqual(response.get_json(), {'imported': 2})
+            workouts = {w.name: w for w in other.workouts}
+            self.assertEqual(sorted(workouts), ['Bench Press', 'Walk'])
+            self.assertEqual(workouts['Bench Press'].last_done, datetime(2025, 3, 2))
+            self.assertEqual(db.session.get(DailyActivity, (other.id, date(2025, 3, 1))).volume, 500)
+            self.assertEqual(self.client.get(f'/export?format={fmt}').get_data(), exported)
+            self.login(self.user)
+
+    def test_import_is_all_or_nothing(self):
+        self.app.config['IMPORT_BATCH_SIZE'] = 2
+        rows = ''.join(f'Row,machine,back,2025-03-{day:02d},100,5,\n' for day in range(1, 6))
+        body = f'{",".join(transfer.FIELDS)}\n{rows}Row,machine,back,not-a-date,100,5,\n'
+        version = self.user.data_version
+
+        response = self.client.post('/import?format=csv', data=body, content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('row 6', response.get_json()['error'])
+        self.assertEqual(db.session.scalar(sa.select(sa.func.count()).select_from(Exercise)), 0)
+        self.assertEqual([w.name for w in db.session.scalars(sa.select(Workout))], ['Bench Press'])
+        self.assertEqual(db.session.get(User, self.user.id).data_version, version)
+
+        # A cross-site form can only send form-encoded or text/plain bodies
+        response = self.client.post('/import?format=csv', data=body, content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+
+    def test_import_rejects_bad_input(self):
+        header = ','.join(transfer.FIELDS) + '\n'
+        good = {'workout': 'Row', 'exercise_type': 'machine', 'muscle_group': 'back', 'date': '2025-03-01'}
+        cases = [
+            ('jsonl', json.dumps(good) + '\n{"workout": \n', 'row 2'),
+            ('jsonl', json.dumps(dict(good, workout=None)) + '\n', 'row 1'),
+            ('jsonl', '[1, 2]\n', 'row 1'),
+            ('csv', header + 'Row,machine,,2025-03-01,,,\n', 'row 1'),
+            ('csv', (header + 'Row,machine,back,2025-03-01,,,\n').encode() + b'Ro\xffw,machine,back,,,,\n', 'UTF-8'),
+        ]
+        for fmt, body, error in cases:
+            response = self.client.post(f'/import?format={fmt}', data=body, content_type=transfer.MIMETYPES[fmt])
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn(error, response.get_json()['error'])
+        self.assertEqual(db.session.scalar(sa.select(sa.func.count()).select_from(Exercise)), 0)
+        self.assertEqual([w.name for w in db.session.scalars(sa.select(Workout))], ['Bench Press'])
+
+    def test_keyset_history_pages(self):
+        url = f'/api/workouts/{self.workout.id}/exercises'
+        self.client.post(url, json=[{'date': f'2025-03-{day:02d}', 'count': day} for day in range(1, 13)])
+
+        first = self.client.get(url + '?limit=5').get_json()
+        self.assertEqual([e['count'] for e in first['exercises']], [12, 11, 10, 9, 8])
+        self.assertIsNone(first['prev'])
+        second = self.client.get(url + f'?limit=5&after={first["next"]}').get_json()
+        self.assertEqual([e['count'] for e in second['exercises']], [7, 6, 5, 4, 3])
+        last = self.client.get(url + f'?limit=5&after={second["next"]}').get_json()
+        self.assertEqual([e['count'] for e in last['exercises']], [2, 1])
+        self.assertIsNone(last['next'])
+
+        back = self.client.get(url + f'?limit=5&before={last["prev"]}').get_json()
+        self.assertEqual(back['exercises'], second['exercises'])
+        self.assertEqual(self.client.get(url + '?after=garbage').status_code, 400)
+
+        page = self.client.get(f'/log-exercise/{self.workout.id}?after={first["next"]}')
+        self.assertIn(f'before={second["prev"]}'.encode(), page.get_data())
+
+    def test_streamed_full_history(self):
+        url = f'/api/workouts/{self.workout.id}/exercises'
+        self.client.post(url, json=[{'date': f'2025-03-{day:02d}', 'weight': 100 + day, 'count': 5}
+                                    for day in range(1, 29)])
+
+        response = self.client.get(f'/log-exercise/{self.workout.id}/history')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        body = response.get_data(as_text=True)
+        self.assertEqual(body.count('lbs'), 28)
+        self.assertLess(body.index('128 lbs'), body.index('101 lbs'))
+
+        other = User(username='Other', email='other@example.com')
+        db.session.add(other)
+        db.session.commit()
+        self.login(other)
+        self.assertEqual(self.client.get(f'/log-exercise/{self.workout.id}/history').status_code, 302)
+
+    def test_response_compression(self):
+        self.client.post(f'/api/workouts/{self.workout.id}/exercises',
+                         json=[{'date': f'2025-{month:02d}-{day:02d}', 'weight': 100, 'count': 5}
+                               for month in range(1, 13) for day in range(1, 29)])
+        gzipped = {'Accept-Encoding': 'gzip'}
+
+        plain = self.client.get('/api/workouts')
+        response = self.client.get('/api/workouts', headers=gzipped)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(gzip.decompress(response.get_data()), plain.get_data())
+        self.assertLess(len(response.get_data()), len(plain.get_data()) / 4)
+        self.assertEqual(response.get_etag(), (plain.get_etag()[0], True))
+        revalidated = self.client.get('/api/workouts', headers={**gzipped, 'If-None-Match': response.headers['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+        small = self.client.get('/api/workouts?from=2025-01-01&to=2025-01-01', headers=gzipped)
+        self.assertNotIn('Content-Encoding', small.headers)
+
+        plain = self.client.get(f'/log-exercise/{self.workout.id}/history')
+        response = self.client.get(f'/log-exercise/{self.workout.id}/history', headers=gzipped)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(gzip.decompress(response.get_data()), plain.get_data())
+
+        with tempfile.TemporaryDirectory() as static:
+            with open(os.path.join(static, 'app.css'), 'w') as f:
+                f.write('body { margin: 0; }\n' * 100)
+            self.app.static_folder = static
+            self.assertEqual(precompress(static, self.app.extensions['compress'], 1024),
+                             [os.path.join(static, 'app.css.gz')])
+            response = self.client.get('/static/app.css', headers=gzipped)
+            self.assertEqual((response.mimetype, response.headers['Content-Encoding']), ('text/css', 'gzip'))
+            self.assertEqual(gzip.decompress(response.get_data()), b'body { margin: 0; }\n' * 100)
+            response.close()
+            response = self.client.get('/static/app.css')
+            self.assertNotIn('Content-Encoding', response.headers)
+            response.close()
+
+    def test_json_providers_agree(self):
+        self.log('2025-03-01', 100, 5)
+        payload = {'day': date(2025, 3, 1), 'at': datetime(2025, 3, 1, 6, 30), 'sets': [5, 3]}
+        bodies = []
+        for provider in (JSONProvider, OrjsonProvider):
+            self.app.json = provider(self.app)
+            bodies.append((self.client.get('/api/workouts').get_data(), json.loads(self.app.json.dumps(payload))))
+        self.assertEqual(bodies[0], bodies[1])
+        self.assertEqual(bodies[0], (b'[["2025-03-01",1]]\n',
+                                     {'at': '2025-03-01T06:30:00', 'day': '2025-03-01', 'sets': [5, 3]}))
+
+    def test_workout_filters_and_search(self):
+        db.session.add_all([
+            Workout(user=self.user, name="Incline Bench Press", exercise_type="free_weight", muscle_group="chest",
+                    last_done=datetime.today()),
+            Workout(user=self.user, name="Deadlift", exercise_type="free_weight", muscle_group="back"),
+            Workout(user=self.user, name="Pull Up", exercise_type="bodyweight", muscle_group="back",
+                    last_done=datetime.today())])
+        db.session.commit()
+
+        def names(query):
+            workouts = self.client.get('/api/workouts/list' + query).get_json()['workouts']
+            return sorted(w['name'] for w in workouts)
+
+        self.assertEqual(names('?muscle_group=back'), ['Deadlift', 'Pull Up'])
+        self.assertEqual(names('?exercise_type=free_weight&stale=stale'), ['Deadlift'])
+        self.assertEqual(names('?stale=fresh'), ['Incline Bench Press', 'Pull Up'])
+        self.assertEqual(names('?q=ben'), ['Bench Press', 'Incline Bench Press'])
+        self.assertEqual(names('?q=bench+incl'), ['Incline Bench Press'])
+        self.assertEqual(self.client.get('/api/workouts/list?muscle_group=wings').status_code, 400)
+
+        # The FTS table follows renames and deletes through its triggers
+        self.workout.name = 'Squat'
+        db.session.commit()
+        self.assertEqual(names('?q=bench'), ['Incline Bench Press'])
+        db.session.delete(db.session.scalar(sa.select(Workout).where(Workout.name == 'Deadlift')))
+        db.session.commit()
+        self.assertEqual(names('?q=dead'), [])
+
+        page = self.client.get('/workouts?muscle_group=back&q=pull').get_data(as_text=True)
+        self.assertIn('Pull Up', page)
+        self.assertNotIn('Squat', page)
+        self.assertIn('>Clear</a>', page)
+        self.assertNotIn('>Clear</a>', self.client.get('/workouts?submit=Filter').get_data(as_text=True))
+
+        plan = ' '.join(str(row) for row in db.session.execute(sa.text(
+            'EXPLAIN QUERY PLAN ' + str(workout_list_query(self.user.id, {'muscle_group': 'back'}).compile(
+                compile_kwargs={'literal_binds': True})))))
+        self.assertIn('ix_workout_user_id_muscle_group_name', plan)
+
+    def test_progress_analytics(self):
+        url = f'/api/workouts/{self.workout.id}/exercises'
+        self.client.post(url, json=[{'date': '2025-03-01', 'weight': 100, 'count': 5},
+                                    {'date': '2025-03-01', 'weight': 110, 'count': 1},
+                                    {'date': '2025-03-08', 'weight': 105, 'count': 10}])
+        progress = self.client.get(f'/api/workouts/{self.workout.id}/progress').get_json()
+        self.assertEqual(progress['sets'], 3)
+        self.assertEqual(progress['personal_records']['weight'], 110)
+        self.assertEqual(progress['personal_records']['e1rm_epley'], 140)
+        self.assertEqual([p['e1rm'] for p in progress['pr_history']], [116.7, 140])
+        self.assertEqual([(s['date'], s['sets'], s['volume']) for s in progress['sessions']],
+                         [('2025-03-01', 2, 610), ('2025-03-08', 1, 1050)])
+        self.assertEqual(progress['weekly'][1]['rolling_volume'], 1660)
+
+        # Sets logged to another workout leave this workout's entry cached
+        other = Workout(user=self.user, name="Row", exercise_type="machine", muscle_group="back")
+        db.session.add(other)
+        db.session.commit()
+        self.client.post(f'/api/workouts/{other.id}/exercises', json=[{'date': '2025-03-09', 'weight': 50, 'count': 8}])
+        cache = self.app.extensions['progress_cache']
+        hits = cache.hits
+        self.client.get(f'/api/workouts/{self.workout.id}/progress')
+        self.assertEqual(cache.hits, hits + 1)
+
+        # A write to this workout bumps its data version, so the cached result is not served again
+        self.client.post(url, json=[{'date': '2025-03-09', 'weight': 200, 'count': 1}])
+        progress = self.client.get(f'/api/workouts/{self.workout.id}/progress').get_json()
+        self.assertEqual(progress['personal_records']['weight'], 200)
+
+    def test_page_cache_hit_and_invalidation(self):
+        self.assertEqual(self.client.get('/workouts').headers['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/workouts').headers['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get('/workouts?x=1').headers['X-Cache'], 'MISS')
+
+        self.log('2025-03-01', 100, 5)
+        response = self.client.get('/workouts')
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+        self.assertNotIn(b'Last done: Never', response.get_data())
+
+    def test_edit_workout_form(self):
+        response = self.client.post(f'/workouts/{self.workout.id}', data={
+            'name': 'Incline Press', 'exercise_type': 'free_weight', 'muscle_group': 'chest_upper'})
+        self.assertEqual(response.status_code, 302)
+        workout = db.session.get(Workout, self.workout.id)
+        self.assertEqual((workout.name, workout.exercise_type, workout.muscle_group),
+                         ('Incline Press', 'free_weight', 'chest_upper'))
+
+    def test_user_loaded_from_cache(self):
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        self.client.get('/user/Derrick')
+        sa.event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            # A fresh session and login state, as on the next real request
+            db.session.remove()
+            g.pop('_login_user', None)
+            # Only data_version is read, and it always goes back to the database
+            self.assertEqual(self.client.get('/user/Derrick').status_code, 200)
+            self.assertEqual(len(statements), 1)
+            self.assertIn('SELECT user.data_version', statements[0])
+
+            g.pop('_login_user', None)
+            self.client.get('/api/workouts')
+            self.assertEqual(len([s for s in statements if 'data_version' in s]), 2)
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute', record)
+
+        # Profile edits drop the cached row
+        self.client.post('/edit_profile', data={'username': 'Derrick', 'about_me': 'Lifting'})
+        db.session.remove()
+        g.pop('_login_user', None)
+        self.assertIn(b'Lifting', self.client.get('/user/Derrick').get_data())
+
+class LastSeenCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app.config['LAST_SEEN_FLUSH_COUNT'] = 2
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.users = [User(username=name, email=f'{name}@example.com', last_seen=datetime(2025, 1, 1))
+                      for name in ('ann', 'bob')]
+        db.session.add_all(self.users)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_last_seen_is_flushed_in_batches(self):
+        ann, bob = self.users
+        last_seen.touch(self.app, ann)
+        last_seen.touch(self.app, ann)
+        self.assertEqual(self.app.extensions['last_seen'].pending.keys(), {ann.id})
+        db.session.refresh(ann)
+        self.assertEqual(ann.last_seen, datetime(2025, 1, 1))
+
+        last_seen.touch(self.app, bob)
+        self.assertEqual(self.app.extensions['last_seen'].pending, {})
+        db.session.refresh(ann)
+        db.session.refresh(bob)
+        self.assertGreater(ann.last_seen, datetime(2025, 1, 1))
+        self.assertGreater(bob.last_seen, datetime(2025, 1, 1))
+
+class PasswordCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_hashing_in_process_pool(self):
+        self.app.config['PASSWORD_HASH_WORKERS'] = 1
+        u = User(username='Derrick', email='derrick@example.com')
+        u.set_password('cat')
+        self.assertTrue(u.password_hash.startswith('pbkdf2:sha256:1000$'))
+        self.assertTrue(u.check_password('cat'))
+        self.assertFalse(u.check_password('dog'))
+        self.app.extensions['passwords'].executor.shutdown()
+
+    def test_saturated_pool_returns_503(self):
+        db.session.add(User(username='Derrick', email='derrick@example.com', password_hash='x'))
+        db.session.commit()
+        self.app.config['PASSWORD_HASH_WORKERS'] = 1
+        slots = self.app.extensions['passwords'].slots
+        while slots.acquire(blocking=False):
+            pass
+        response = self.client.post('/auth/login', data={'username': 'Derrick', 'password': 'cat'})
+        self.assertEqual(response.status_code, 503)
+
+    def test_hash_timeout_is_busy_and_keeps_its_slot(self):
+        config = type('SlowHashConfig', (TestConfig,), {
+            'PASSWORD_HASH_WORKERS': 1, 'PASSWORD_HASH_QUEUE': 0, 'PASSWORD_HASH_TIMEOUT': 0.01,
+            'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:200000'})
+        app = create_app(config)
+        state = app.extensions['passwords']
+        with app.app_context():
+            with self.assertRaises(HashingPoolBusy):
+                passwords.hash('cat')
+            # The hash is still running in the pool, so its slot is not free yet
+            self.assertFalse(state.slots.acquire(blocking=False))
+            self.assertTrue(state.slots.acquire(timeout=30))
+            state.slots.release()
+        state.executor.shutdown()
+
+    def test_rehash_on_login(self):
+        u = User(username='Derrick', email='derrick@example.com')
+        u.set_password('cat')
+        db.session.add(u)
+        db.session.commit()
+
+        self.app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+        self.client.post('/auth/login', data={'username': 'Derrick', 'password': 'cat'})
+        db.session.refresh(u)
+        self.assertTrue(u.password_hash.startswith('pbkdf2:sha256:2000$'))
+        self.assertTrue(u.check_password('cat'))
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+class CacheCase(unittest.TestCase):
+    def test_lru_eviction_and_ttl(self):
+        cache = LRUCache(max_entries=2, max_bytes=10, default_timeout=60)
+        cache.set('a', 'aaaa')
+        cache.set('b', 'bbbb')
+        self.assertEqual(cache.get('a'), 'aaaa')
+        cache.set('c', 'cccc')
+        self.assertIsNone(cache.get('b'))
+        cache.set('d', 'dddddd')
+        self.assertIsNone(cache.get('a'))
+        cache.set('e', 'e', timeout=-1)
+        self.assertIsNone(cache.get('e'))
+        self.assertEqual(cache.stats()['evictions'], 3)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertLessEqual(cache.stats()['bytes'], 10)
+
+    def test_shared_cache(self):
+        client = FakeRedis()
+        first, second = SharedCache(client), SharedCache(client)
+        first.set('k', {'html': '<p>'})
+        self.assertEqual(second.get('k'), {'html': '<p>'})
+        first.delete('k')
+        self.assertIsNone(second.get('k'))
+        self.assertEqual(second.stats()['misses'], 1)
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    # Just enough SMTP for smtplib; counts connections and delivered messages
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('localhost', 0), FakeSMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = self.messages = self.refuse = 0
+        self.reject = set()
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            refuse, server.refuse = server.refuse > 0, max(server.refuse - 1, 0)
+        if refuse:
+            self.wfile.write(b'421 busy\r\n')
+            return
+        self.wfile.write(b'220 localhost\r\n')
+        recipients = []
+        for line in self.rfile:
+            command = line[:4].upper()
+            if command == b'RCPT':
+                recipients.append(line.decode())
+            elif command == b'DATA' and any(r in rcpt for r in server.reject for rcpt in recipients):
+                recipients = []
+                self.wfile.write(b'554 message rejected\r\n')
+                continue
+            if command == b'DATA':
+                recipients = []
+                self.wfile.write(b'354 go ahead\r\n')
+                for data in self.rfile:
+                    if data == b'.\r\n':
+                        break
+                with server.lock:
+                    server.messages += 1
+            elif command == b'QUIT':
+                self.wfile.write(b'221 bye\r\n')
+                return
+            self.wfile.write(b'250 ok\r\n')
+
+class MailQueueCase(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeSMTPServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        config = type('MailConfig', (TestConfig,), {
+            'MAIL_SERVER': 'localhost', 'MAIL_PORT': self.server.server_address[1],
+            'MAIL_SUPPRESS_SEND': False, 'MAIL_WORKERS': 2, 'MAIL_BATCH_SIZE': 20,
+            'MAIL_RETRY_BACKOFF': 0.01})
+        self.app = create_app(config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        mail_queue.drain(self.app)
+        self.app_context.pop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def send(self, count):
+        for i in range(count):
+            send_email('Hello', sender='admin@example.com', recipients=[f'user{i}@example.com'],
+                       text_body='text', html_body='<p>html</p>')
+
+    def test_batched_delivery_with_bounded_threads(self):
+        start = time.perf_counter()
+        self.send(200)
+        workers = [t for t in threading.enumerate() if t.name.startswith('mail-worker')]
+        self.assertEqual(len(workers), 2)
+        mail_queue.drain(self.app)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(self.server.messages, 200)
+        self.assertLess(elapsed, 10)
+        # Connections are reused across each batch instead of opened per email
+        self.assertLess(self.server.connections, 50)
+        self.assertEqual(mail_queue.stats(self.app)['sent'], 200)
+
+    def test_retry_with_backoff(self):
+        self.server.refuse = 2
+        self.send(5)
+        mail_queue.drain(self.app)
+        self.assertEqual(self.server.messages, 5)
+        self.assertEqual(mail_queue.stats(self.app)['failed'], 0)
+
+    def test_rejected_message_is_dropped_alone(self):
+        self.server.reject = {'<user2@example.com>'}
+        self.send(5)
+        mail_queue.drain(self.app)
+        self.assertEqual(self.server.messages, 4)
+        # No reconnects: at most one connection per mail worker
+        self.assertLessEqual(self.server.connections, 2)
+        stats = mail_queue.stats(self.app)
+        self.assertEqual((stats['sent'], stats['failed']), (4, 1))
+
+class PoolCase(unittest.TestCase):
+    def test_engine_options_per_driver(self):
+        options = engine_options({'SQLALCHEMY_DATABASE_URI': 'postgresql+psycopg2://u@db/fitness',
+                                  'DB_POOL_SIZE': '20', 'DB_STATEMENT_TIMEOUT': '1500'})
+        self.assertEqual(options['pool_size'], 20)
+        self.assertEqual(options['max_overflow'], 10)
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertEqual(options['connect_args'], {'options': '-c statement_timeout=1500'})
+
+        options = engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///app.db', 'DB_POOL_PRE_PING': 'true'})
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertEqual(options['pool_recycle'], -1)
+        self.assertEqual(options['connect_args'], {'timeout': 5})
+        self.assertEqual(engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}), {})
+
+    def test_pool_metrics(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = type('PoolConfig', (TestConfig,), {
+                'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp}/pool.db',
+                'DB_POOL_SIZE': 1, 'DB_MAX_OVERFLOW': 0, 'DB_POOL_TIMEOUT': 0.05})
+            app = create_app(config)
+            with app.app_context():
+                held = db.engine.connect()
+                with self.assertRaises(sa.exc.TimeoutError):
+                    db.engine.connect()
+                self.assertEqual(pool_stats(db.engine)['checked_out'], 1)
+                held.close()
+
+                body = app.test_client().get('/metrics').get_data(as_text=True)
+                self.assertIn('db_pool_timeouts_total 1', body)
+                self.assertIn('db_pool_checkouts_total 2', body)
+                self.assertIn('cache_hits_total 0', body)
+                db.engine.dispose()
+
+class InstrumentationCase(unittest.TestCase):
+    def setUp(self):
+        self.metrics_dir = tempfile.TemporaryDirectory()
+        config = type('MetricsConfig', (TestConfig,), {'METRICS_DIR': self.metrics_dir.name})
+        self.app = create_app(config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        self.metrics_dir.cleanup()
+
+    def test_server_timing_and_slow_queries(self):
+        self.app.config['SLOW_QUERY_MS'] = 0
+        with self.assertLogs(self.app.logger, 'WARNING') as logs:
+            response = self.client.post('/auth/login', data={'username': 'nobody', 'password': 'x'})
+        self.assertIn('Slow query', logs.output[0])
+        self.assertIn('auth.login', logs.output[0])
+        timing = response.headers['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn('render;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_metrics_aggregate_workers(self):
+        self.client.get('/auth/login')
+        # Another worker's snapshot in the shared directory
+        other = {'auth.login': {'count': 2, 'errors': 1, 'queries': 4, 'db_seconds': 0.5,
+                                'duration_sum': 0.3, 'buckets': [0] * 10 + [2]}}
+        with open(os.path.join(self.metrics_dir.name, 'worker-1.json'), 'w') as f:
+            json.dump(other, f)
+
+        body = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('http_requests_total{endpoint="auth.login"} 3', body)
+        self.assertIn('http_request_errors_total{endpoint="auth.login"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{endpoint="auth.login",le="+Inf"} 3', body)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+
 def test_edit_workout(self):
     user = User(username="Alice", email="alice@example.com")
     workout = Workout(user=user, name="Initial Workout", exercise_type="machine", muscle_group="back")
@@ -115,5 +1030,36 @@ def test_delete_workout(self):
     deleted_workout = Workout.query.get(workout.id)
     self.assertIsNone(deleted_workout)
 
+class MigrationCase(unittest.TestCase):
+    def test_exercise_keys_backfill_and_downgrade(self):
+        from flask_migrate import Migrate, upgrade, downgrade
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+        with tempfile.TemporaryDirectory() as tmp:
+            config = type('MigrationConfig', (TestConfig,), {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp}/m.db'})
+            app = create_app(config)
+            Migrate(app, db, directory=directory)
+            with app.app_context():
+                upgrade(directory, 'e2f58b0a41c6')
+                with db.engine.begin() as conn:
+                    conn.execute(sa.text("INSERT INTO user (id, username, email, data_version) "
+                                         "VALUES (1, 'a', 'a@example.com', 0), (2, 'b', 'b@example.com', 0)"))
+                    conn.execute(sa.text("INSERT INTO workout (id, name, exercise_type, user_id, muscle_group) "
+                                         "VALUES (1, 'Row', 'machine', 1, 'back'), (2, 'Walk', 'cardio', 2, 'heart')"))
+                    conn.execute(sa.text("INSERT INTO exercise (id, date) VALUES (1, '2025-01-01'), "
+                                         "(2, '2025-01-02'), (3, '2025-01-03')"))
+                    conn.execute(sa.text("INSERT INTO workout_exercise VALUES (1, 1), (2, 2), (1, 2)"))
+
+                upgrade(directory, 'f31c7d9a8e54')
+                with db.engine.connect() as conn:
+                    rows = conn.execute(sa.text('SELECT id, workout_id, user_id FROM exercise ORDER BY id')).all()
+                    self.assertEqual([tuple(row) for row in rows], [(1, 1, 1), (2, 1, 1), (3, None, None)])
+
+                downgrade(directory, 'e2f58b0a41c6')
+                with db.engine.connect() as conn:
+                    links = conn.execute(sa.text('SELECT workout_id, exercise_id FROM workout_exercise '
+                                                 'ORDER BY exercise_id')).all()
+                    self.assertEqual([tuple(row) for row in links], [(1, 1), (1, 2)])
+                db.engine.dispose()
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)